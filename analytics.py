@@ -0,0 +1,77 @@
+import os
+import json
+import time
+import logging
+from collections import Counter, deque
+
+logger = logging.getLogger(__name__)
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+class SearchLog:
+    """Ring buffer of recent searches, flushed to an append-only JSONL file.
+
+    Each record holds the search kind, normalized query, result count and
+    latency in milliseconds. Reports are computed from the buffer, which is
+    refilled from the tail of the file on startup.
+    """
+
+    def __init__(self, path, capacity=5000):
+        self.path = path
+        self._records = deque(maxlen=capacity)
+        self._unflushed = []
+
+    def __len__(self):
+        return len(self._records)
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding='utf-8') as f:
+            for line in deque(f, maxlen=self._records.maxlen):
+                try:
+                    self._records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+        logger.info(f"Loaded {len(self._records)} search log records")
+
+    def record(self, kind, query, results, latency):
+        record = {
+            'ts': round(time.time(), 3),
+            'kind': kind,
+            'query': query,
+            'results': results,
+            'ms': round(latency * 1000, 3),
+        }
+        self._records.append(record)
+        self._unflushed.append(record)
+
+    def take_unflushed(self):
+        records, self._unflushed = self._unflushed, []
+        return records
+
+    def write(self, records):
+        """Append records to the log file. Blocking; meant to run in a worker thread."""
+        if not records:
+            return
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records))
+
+    def report(self, top=5):
+        records = list(self._records)
+        queries = Counter((r['kind'], r['query']) for r in records)
+        zero = Counter((r['kind'], r['query']) for r in records if not r['results'])
+        latencies = [r['ms'] for r in records]
+        return {
+            'searches': len(records),
+            'top': queries.most_common(top),
+            'zero': zero.most_common(top),
+            'p50': percentile(latencies, 0.5),
+            'p95': percentile(latencies, 0.95),
+        }
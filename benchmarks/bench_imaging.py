@@ -0,0 +1,158 @@
+"""Benchmark preview/receipt processing on synthetic phone-camera photos.
+
+Compares the old pipeline (full decode, convert, LANCZOS thumbnail, fixed
+quality) with imaging.load_resized() + encode_jpeg() (draft decode and
+quality search toward a byte target).
+
+Ordinary photos fit both targets at the first quality, so those profiles
+only measure draft(). The last case encodes high-detail photos at preview
+size with the 256 KB receipt target, which forces the quality search; it
+reports the number of JPEG encodes per photo and checks every output fits.
+Even pure noise stays under 256 KB at 640px, so the receipt profile itself
+cannot trigger the search.
+
+    python benchmarks/bench_imaging.py [--images 8] [--width 4032] [--height 3024]
+"""
+import io
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw, ImageFilter  # noqa: E402
+
+from imaging import (load_resized, encode_jpeg, MAX_PHOTO_BYTES,  # noqa: E402
+                     PREVIEW_TARGET_BYTES, RECEIPT_TARGET_BYTES)
+
+PROFILES = {
+    # ad: (ölçü, keyfiyyət, hədəf bayt, minimum keyfiyyət)
+    'preview': ((1280, 1280), 70, PREVIEW_TARGET_BYTES, 40),
+    'receipt': ((640, 640), 70, RECEIPT_TARGET_BYTES, 50),
+}
+# Keyfiyyət axtarışını məcbur edən hal: detallı foto, önizləmə ölçüsü, qəbz hədəfi
+SEARCH_PROFILE = ((1280, 1280), 70, RECEIPT_TARGET_BYTES, 40)
+
+# encode_jpeg() və legacy() çağırışlarındakı JPEG kodlaşdırmalarının sayı
+encodes = 0
+_save = Image.Image.save
+
+
+def _counting_save(image, fp, format=None, **params):
+    global encodes
+    if format == "JPEG":
+        encodes += 1
+    return _save(image, fp, format, **params)
+
+
+Image.Image.save = _counting_save
+
+
+def phone_photo(width, height, rng):
+    """JPEG bytes resembling a phone shot of a slide: gradient, shapes, text lines, sensor noise."""
+    image = Image.merge("RGB", [
+        Image.linear_gradient("L").resize((width, height)),
+        Image.linear_gradient("L").rotate(90).resize((width, height)),
+        Image.new("L", (width, height), rng.randint(80, 200)),
+    ])
+    draw = ImageDraw.Draw(image)
+    for _ in range(40):
+        x, y = rng.randrange(width), rng.randrange(height)
+        w, h = rng.randint(50, width // 3), rng.randint(50, height // 3)
+        color = tuple(rng.randrange(256) for _ in range(3))
+        (draw.rectangle if rng.random() < 0.5 else draw.ellipse)((x, y, x + w, y + h), fill=color)
+    for row in range(height // 8, height, height // 20):
+        draw.line((width // 10, row, width - width // 10, row), fill=(20, 20, 20), width=height // 200)
+    noise = Image.effect_noise((width, height), 24).convert("RGB")
+    image = Image.blend(image, noise, 0.15).filter(ImageFilter.GaussianBlur(1))
+
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=92)
+    return output.getvalue()
+
+
+def detailed_photo(width, height, rng):
+    """phone_photo() overlaid with fine texture (foliage, gravel) that survives downscaling."""
+    image = Image.open(io.BytesIO(phone_photo(width, height, rng))).convert("RGB")
+    texture = Image.merge("RGB", [Image.effect_noise((width // 3, height // 3), 90) for _ in range(3)])
+    image = Image.blend(image, texture.resize((width, height), Image.Resampling.BILINEAR), 0.6)
+
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=92)
+    return output.getvalue()
+
+
+def legacy(data, max_size, quality, fallback_quality=50):
+    image = Image.open(io.BytesIO(data))
+    image = image.convert("RGB")
+    image.thumbnail(max_size, Image.Resampling.LANCZOS)
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=quality, optimize=True)
+    if output.tell() > MAX_PHOTO_BYTES:
+        output = io.BytesIO()
+        image.save(output, format="JPEG", quality=fallback_quality, optimize=True)
+    return output.getvalue()
+
+
+def current(data, max_size, quality, target_bytes, min_quality):
+    image = load_resized(io.BytesIO(data), max_size)
+    return encode_jpeg(image, quality, target_bytes, min_quality)
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--images', type=int, default=8)
+    parser.add_argument('--width', type=int, default=4032)
+    parser.add_argument('--height', type=int, default=3024)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    start = time.perf_counter()
+    corpus = [phone_photo(args.width, args.height, rng) for _ in range(args.images)]
+    detailed = [detailed_photo(args.width, args.height, rng) for _ in range(args.images)]
+    average = sum(map(len, corpus + detailed)) / len(corpus + detailed) / (1024 * 1024)
+    print(f"Generated {len(corpus)} ordinary and {len(detailed)} detailed photos {args.width}x{args.height}, "
+          f"avg {average:.2f} MB, in {time.perf_counter() - start:.1f}s")
+
+    def bench(label, photos, process):
+        global encodes
+        timings, sizes = [], []
+        encodes = 0
+        for data in photos:
+            t0 = time.process_time()
+            sizes.append(len(process(data)))
+            timings.append((time.process_time() - t0) * 1000)
+        print(f"{label:<18} CPU p50 {percentile(timings, 0.5):7.1f} ms   "
+              f"mean {sum(timings) / len(timings):7.1f} ms   encodes {encodes / len(photos):4.1f}/photo   "
+              f"avg size {sum(sizes) / len(sizes) / 1024:7.1f} KB   max {max(sizes) / 1024:7.1f} KB")
+        return sum(timings), max(sizes)
+
+    saved = []
+    for name, (max_size, quality, target_bytes, min_quality) in PROFILES.items():
+        print(f"\n{name} ({max_size[0]}px, q{quality}, target {target_bytes // 1024} KB)")
+        old, _ = bench("legacy", corpus, lambda data: legacy(data, max_size, quality))
+        new, _ = bench("draft + search", corpus,
+                       lambda data: current(data, max_size, quality, target_bytes, min_quality))
+        saved.append(1 - new / old)
+        print(f"CPU saved: {saved[-1]:.0%}")
+
+    max_size, quality, target_bytes, min_quality = SEARCH_PROFILE
+    print(f"\ndetailed photos ({max_size[0]}px, q{quality}, target {target_bytes // 1024} KB)")
+    bench("legacy", detailed, lambda data: legacy(data, max_size, quality))
+    _, largest = bench("draft + search", detailed,
+                       lambda data: current(data, max_size, quality, target_bytes, min_quality))
+    print(f"All outputs within target: {'yes' if largest <= target_bytes else 'NO'}")
+
+    return 0 if min(saved) > 0 and largest <= target_bytes else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,100 @@
+"""Benchmark NameIndex searches on a synthetic catalog.
+
+The pass/fail gate is NameIndex.search() ranking one page of results, as
+inline mode does, with the misspelled and unfolded queries below that go
+through the fuzzy fallback. Ranking every match (the chat result list) is
+reported but not gated.
+
+    python benchmarks/bench_search.py [--slides 50000] [--queries 2000] [--page 8]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search import NameIndex, tokenize  # noqa: E402
+
+SUBJECTS = [
+    "Riyaziyyat", "Ali riyaziyyat", "Fizika", "Kimya", "Biologiya", "Tarix",
+    "Azərbaycan tarixi", "İqtisadiyyat", "Mikroiqtisadiyyat", "Makroiqtisadiyyat",
+    "Proqramlaşdırma", "Şəbəkə təhlükəsizliyi", "Verilənlər bazası", "Alqoritmlər",
+    "Ədəbiyyat", "Coğrafiya", "Fəlsəfə", "Psixologiya", "Sosiologiya", "Menecment",
+    "Marketinq", "Mühasibat uçotu", "Statistika", "Ekologiya", "Hüquq", "Pedaqogika",
+]
+TOPICS = [
+    "giriş", "əsaslar", "nəzəriyyə", "praktika", "mühazirə", "seminar", "analiz",
+    "tətbiqlər", "metodlar", "modellər", "sistemlər", "inkişaf", "problemlər",
+    "qanunlar", "prinsiplər", "strategiya", "idarəetmə", "tədqiqat", "layihə",
+]
+
+# Hərf səhvləri və xüsusi hərflərin latın qarşılıqları ilə yazılış
+QUERIES = [
+    "riyaziyat", "riyaziyyat", "fizka", "kimya", "iqtisadiyat", "proqramlasdirma",
+    "sebeke tehlukesizliyi", "verilenler bazasi", "algoritmler", "edebiyyat",
+    "cografiya", "felsefe", "psixoloqiya", "menecment", "muhasibat ucotu",
+    "statistka", "mühazire", "tedqiqat layihe", "azerbaycan tarixi", "İQTİSADİYYAT",
+]
+
+
+def build_catalog(size, rng):
+    slides = []
+    for i in range(size):
+        name = f"{rng.choice(SUBJECTS)} {rng.choice(TOPICS)} {rng.randint(1, 400)}"
+        if rng.random() < 0.3:
+            name += f" {rng.choice(TOPICS)}"
+        slides.append({'id': f"{i:08x}", 'name': name})
+    return slides
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--slides', type=int, default=50000)
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--page', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    slides = build_catalog(args.slides, rng)
+
+    index = NameIndex()
+    start = time.perf_counter()
+    for slide in slides:
+        index.add(slide)
+    build = time.perf_counter() - start
+    print(f"Indexed {len(index)} slides, {len(index.trigrams)} distinct tokens in {build:.2f}s")
+
+    def bench(label, lookup):
+        timings = []
+        for _ in range(args.queries):
+            query = rng.choice(QUERIES)
+            t0 = time.perf_counter()
+            lookup(query)
+            timings.append((time.perf_counter() - t0) * 1000)
+        print(f"{label:<24} p50 {percentile(timings, 0.5):.3f} ms   "
+              f"p95 {percentile(timings, 0.95):.3f} ms   max {max(timings):.3f} ms")
+        return timings
+
+    def fuzzy_lookup(query):
+        for token in tokenize(query):
+            index.trigrams.similar(token)
+
+    bench("trigram lookup", fuzzy_lookup)
+    pages = bench(f"search, first {args.page}", lambda query: index.search(query, limit=args.page))
+    bench("search, all ranked", index.search)
+
+    p95 = percentile(pages, 0.95)
+    print(f"First-page search p95 {'<' if p95 < 1 else '>='} 1 ms: {'OK' if p95 < 1 else 'SLOW'}")
+    return 0 if p95 < 1 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
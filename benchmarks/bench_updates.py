@@ -0,0 +1,152 @@
+"""Benchmark how long unrelated users wait while others' photos are processed.
+
+Sellers send 12MP photos that go through ImageService.preview(), like
+handle_image; at the same moment other users send text messages. The
+sequential mode is python-telegram-bot's default of one update at a time;
+the per-user mode is updates.PerUserUpdateProcessor as configured in
+bot.main(). Each seller also sends a text right after the photo, which must
+still be handled after it. The gate is the per-user mode's p95 latency for
+unrelated users.
+
+Bot.initialize() calls getMe, so a tiny local HTTP endpoint answers the
+Bot API; no update handler talks to it.
+
+    python benchmarks/bench_updates.py [--sellers 4] [--users 8] [--rounds 5]
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram import Update  # noqa: E402
+from telegram.ext import Application, MessageHandler, filters  # noqa: E402
+
+from imaging import ImageService  # noqa: E402
+from updates import PerUserUpdateProcessor  # noqa: E402
+from bench_imaging import phone_photo, percentile  # noqa: E402
+
+TOKEN = "1:bench"
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+GATE_MS = 50
+
+
+async def bot_api(reader, writer):
+    # Yalnız getMe lazımdır; qalan bütün metodlara "ok" cavabı
+    try:
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = re.search(rb"content-length:\s*(\d+)", head, re.I)
+            if length:
+                await reader.readexactly(int(length.group(1)))
+            method = head.split(b" ", 2)[1].rsplit(b"/", 1)[-1]
+            body = json.dumps({"ok": True, "result": BOT_USER if method == b"getMe" else True}).encode()
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                         b"Content-Length: %d\r\n\r\n%s" % (len(body), body))
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+def message(update_id, user_id, **content):
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id, "date": 0,
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": f"User {user_id}"},
+            **content,
+        },
+    }
+
+
+async def run(label, processor, photo, args, base_url, directory):
+    images = ImageService(2, 8)
+    enqueued = {}
+    latencies = []
+    order = {}
+
+    async def on_photo(update, context):
+        await images.preview(photo, os.path.join(directory, f"{update.update_id}.jpg"))
+        order.setdefault(update.effective_user.id, []).append('photo')
+
+    async def on_text(update, context):
+        elapsed = (time.perf_counter() - enqueued[update.update_id]) * 1000
+        if update.message.text == 'unrelated':
+            latencies.append(elapsed)
+        else:
+            order.setdefault(update.effective_user.id, []).append('text')
+
+    builder = Application.builder().token(TOKEN).base_url(base_url).updater(None).job_queue(None)
+    if processor is not None:
+        builder = builder.concurrent_updates(processor)
+    app = builder.build()
+    app.add_handler(MessageHandler(filters.PHOTO, on_photo))
+    app.add_handler(MessageHandler(filters.TEXT, on_text))
+
+    rng = random.Random(args.seed)
+    update_id = 0
+    started = time.perf_counter()
+    async with app:
+        await app.start()
+        for _ in range(args.rounds):
+            batch = []
+            for seller in range(args.sellers):
+                user_id = 1000 + seller
+                batch.append(message(update_id := update_id + 1, user_id, photo=[
+                    {"file_id": "p", "file_unique_id": "p", "width": args.width, "height": args.height}]))
+                batch.append(message(update_id := update_id + 1, user_id, text='after photo'))
+            for user in range(args.users):
+                batch.insert(rng.randrange(len(batch) + 1), message(update_id := update_id + 1, 2000 + user,
+                                                                     text='unrelated'))
+            for data in batch:
+                update = Update.de_json(data, app.bot)
+                enqueued[update.update_id] = time.perf_counter()
+                await app.update_queue.put(update)
+            await app.update_queue.join()
+        await app.stop()
+    images.shutdown()
+
+    in_order = all(events == ['photo', 'text'] * args.rounds for events in order.values())
+    print(f"{label:<12} unrelated p50 {percentile(latencies, 0.5):8.1f} ms   "
+          f"p95 {percentile(latencies, 0.95):8.1f} ms   max {max(latencies):8.1f} ms   "
+          f"total {time.perf_counter() - started:5.1f}s   same-user order {'kept' if in_order else 'BROKEN'}")
+    return percentile(latencies, 0.95), in_order
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sellers', type=int, default=4)
+    parser.add_argument('--users', type=int, default=8)
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--width', type=int, default=4032)
+    parser.add_argument('--height', type=int, default=3024)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    photo = phone_photo(args.width, args.height, random.Random(args.seed))
+    server = await asyncio.start_server(bot_api, '127.0.0.1', 0)
+    base_url = f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}/bot"
+    print(f"{args.rounds} rounds of {args.sellers} photos ({args.width}x{args.height}) "
+          f"and {args.users} unrelated text messages")
+
+    with tempfile.TemporaryDirectory() as directory:
+        await run("sequential", None, photo, args, base_url, directory)
+        p95, in_order = await run("per-user", PerUserUpdateProcessor(64), photo, args, base_url, directory)
+    server.close()
+
+    ok = p95 < GATE_MS and in_order
+    print(f"\nGate: per-user p95 < {GATE_MS} ms with same-user order kept: {'OK' if ok else 'FAIL'}")
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(main()))
@@ -1,13 +1,38 @@
 import os
-import json
+import re
+import asyncio
+import html
+import hashlib
+import time
 import logging
 from uuid import uuid4
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardRemove
-from telegram.ext import Application, CommandHandler, MessageHandler, filters, CallbackQueryHandler, ContextTypes, ConversationHandler
-from telegram.error import TelegramError
-from config import TOKEN, ADMIN_CHAT_ID
-from PIL import Image
-import io
+from contextlib import ExitStack
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from telegram import (Update, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardRemove,
+                      InlineQueryResultArticle, InputTextMessageContent, InputMediaPhoto)
+from telegram.ext import (Application, CommandHandler, MessageHandler, filters, CallbackQueryHandler,
+                          ContextTypes, ConversationHandler, InlineQueryHandler)
+from telegram.error import TelegramError, BadRequest
+from config import (TOKEN, ADMIN_CHAT_ID, STORAGE_BACKEND, DB_FILE, PAYMENTS_FILE,
+                    PENDING_UPLOADS_FILE, SQLITE_FILE, JOURNAL_COMPACT_INTERVAL,
+                    PENDING_UPLOAD_TTL, UPLOAD_SWEEP_INTERVAL, CONTENT_DIR, CONTENT_WORKERS,
+                    SEARCH_LOG_FILE, IMAGE_WORKERS, IMAGE_MAX_PENDING, CONCURRENT_UPDATES,
+                    RECEIPT_HASH_DISTANCE, PREVIEW_HASH_DISTANCE, THUMBNAILS_DIR,
+                    THUMBNAIL_CACHE_MB)
+from catalog import SlideCatalog
+from storage import create_storage, PersistenceWriter
+from payments import PaymentLedger, PENDING, APPROVED, REJECTED
+from uploads import PendingUploads, upload_files, reclaim_files
+from filestore import FileStore
+from search import (NameIndex, FacetIndex, ResultCache, SortedViews, ContentIndex, Suggester,
+                    PRICE_BUCKETS, normalize)
+from extract import extract_tokens, read_cached, remove_cached, text_cache_path, file_metadata
+from analytics import SearchLog
+from imaging import ImageService
+from dedup import ImageHashIndex, format_hash
+from thumbnails import ThumbnailCache
+from updates import PerUserUpdateProcessor
 
 # Configure logging
 logging.basicConfig(
@@ -22,12 +47,10 @@ LANGUAGES = ["Azərbaycan", "İngilis", "Rus"]
 (UPLOAD_SLIDE, UPLOAD_NAME, UPLOAD_CATEGORY, UPLOAD_PRICE, UPLOAD_CARD,
  UPLOAD_IMAGE, UPLOAD_LANGUAGE, UPLOAD_PAGES, SEARCH_TYPE, SEARCH_CATEGORY, 
  SELECT_SLIDE, CONFIRM_PAYMENT, SEARCH_OTHER_CATEGORY, SEARCH_LANGUAGE,
- MY_SLIDES, SELECT_SLIDE_ACTION, EDIT_FIELD, EDIT_VALUE) = range(18)
+ MY_SLIDES, SELECT_SLIDE_ACTION, EDIT_FIELD, EDIT_VALUE, SEARCH_FILTER, SEARCH_CONTENT) = range(20)
 
 
 
-DB_FILE = "db.json"
-
 # Məşhur dərs kateqoriyaları
 CATEGORIES = [
     "IT", "Riyaziyyat", "Elektronika", "English", "Biznes və İdarəetmə",
@@ -35,24 +58,115 @@ CATEGORIES = [
     "Tibb", "Tarix", "Hüquq", "SƏTƏMM", "Digər"
 ]
 
-def load_slides():
-    if os.path.exists(DB_FILE):
-        try:
-            with open(DB_FILE, 'r', encoding='utf-8') as f:
-                slides = json.load(f)
-                # Ensure each slide has a sales field
-                for slide in slides:
-                    if 'sales' not in slide:
-                        slide['sales'] = 0
-                return slides
-        except json.JSONDecodeError:
-            logger.error("Error decoding db.json. Creating empty database.")
-            return []
-    return []
+FILE_TYPES = ["pdf", "ppt", "pptx"]
+
+PRICE_LABELS = (
+    [f"{PRICE_BUCKETS[0]} AZN-dək"]
+    + [f"{low}-{high} AZN" for low, high in zip(PRICE_BUCKETS, PRICE_BUCKETS[1:])]
+    + [f"{PRICE_BUCKETS[-1]} AZN-dən çox"]
+)
+
+# Axtarış nəticələrində bir səhifədə göstərilən slayd sayı
+RESULTS_PER_PAGE = 8
+
+# "Ən çox satılanlar" və "Yeni əlavələr" siyahılarının uzunluğu
+TOP_LIMIT = 40
+
+# Nəticə siyahılarındakı sıralama düymələri
+SORT_TITLES = {
+    'popular': "🔥 Populyar",
+    'newest': "🆕 Yeni",
+    'cheapest': "💰 Ucuz",
+}
+
+# Inline rejimdə bir cavabda qaytarılan nəticə sayı (Telegram limiti 50-dir)
+INLINE_PAGE_SIZE = 20
+
+# Telegram-ın inline cavabları öz tərəfində saxladığı müddət (saniyə)
+INLINE_CACHE_TIME = 300
+
+# Birgə filtr axtarışında göstərilən fasetlər
+FACET_TITLES = {
+    'category': "📚 Kateqoriya",
+    'language': "🌐 Dil",
+    'file_type': "📄 Format",
+    'price': "💰 Qiymət",
+}
+
+# Slaydlar, ödənişlər və gözləyən yükləmələr üçün saxlama qatı (json və ya sqlite)
+storage = create_storage(STORAGE_BACKEND, DB_FILE, PAYMENTS_FILE, PENDING_UPLOADS_FILE, SQLITE_FILE)
+
+# Bütün yazılar tək bir tapşırıq tərəfindən qruplaşdırılaraq diskə yazılır
+writer = PersistenceWriter(storage)
+
+# Bütün slaydlar yaddaşda saxlanılır, main() işə düşəndə bir dəfə yüklənir
+catalog = SlideCatalog(storage, writer)
+
+# Ad üzrə axtarış üçün inverted indeks, kataloq dəyişdikcə yenilənir
+name_index = NameIndex()
+catalog.add_listener(name_index)
+
+# Kateqoriya, dil, format və qiymət üzrə faset indeksləri
+facets = FacetIndex()
+catalog.add_listener(facets)
+
+# Satış, tarix və qiymət üzrə hazır sıralanmış siyahılar
+sorted_views = SortedViews()
+catalog.add_listener(sorted_views)
+
+# Nəticəsiz axtarışlar üçün ad və kateqoriya təklifləri
+suggester = Suggester()
+catalog.add_listener(suggester)
+
+# Populyar sorğuların nəticələri; kataloq versiyası dəyişəndə köhnəlir
+result_cache = ResultCache()
+
+# Önizləmə və qəbz şəkilləri ayrıca proseslərdə emal olunur
+image_service = ImageService(IMAGE_WORKERS, IMAGE_MAX_PENDING)
+
+# Baxış zamanı göndərilən kiçik önizləmə nüsxələri; disk həcmi limitlidir
+thumbnail_cache = ThumbnailCache(THUMBNAILS_DIR, image_service, THUMBNAIL_CACHE_MB * 1024 * 1024)
+
+# Qəbz və önizləmə şəkillərinin perseptual heşləri; təkrar istifadə olunan şəkilləri tapmaq üçün
+image_hashes = ImageHashIndex()
+
+# Axtarış sorğuları, nəticə sayı və gecikmə; /stats üçün
+search_log = SearchLog(SEARCH_LOG_FILE)
+
+# Slayd fayllarının mətni; çıxarış ayrıca proseslərdə, event loop-dan kənarda aparılır
+content_index = ContentIndex()
+content_pool = ProcessPoolExecutor(max_workers=CONTENT_WORKERS)
+
+# Ödənişlər id, alıcı və slayd üzrə indekslənmiş jurnalda saxlanılır
+ledger = PaymentLedger(storage, writer)
+
+# Admin təsdiqini gözləyən yükləmələr; köhnələnlər fon tapşırığı ilə silinir
+pending_uploads = PendingUploads(storage, writer)
+
+# Slayd faylları məzmun heşinə görə saxlanılır, eyni fayl bir dəfə yazılır
+filestore = FileStore("downloads")
 
+# Yükləmə söhbəti davam edərkən faylın istinadı: user_id -> (yol, vaxt)
+draft_files = {}
 
 
-def save_slide(slide):
+def hold_draft_file(user_id, path):
+    """Reference a freshly downloaded file until the upload is submitted or abandoned."""
+    release_draft_file(user_id)
+    filestore.acquire(path)
+    draft_files[user_id] = (path, time.time())
+
+def release_draft_file(user_id, delete=True):
+    draft = draft_files.pop(user_id, None)
+    if draft:
+        release_slide_file(draft[0], delete=delete)
+
+def release_slide_file(path, delete=True):
+    # Fayl silinirsə, ondan çıxarılmış mətnin keşi də silinir
+    if filestore.release(path, delete):
+        remove_cached(path, CONTENT_DIR)
+
+async def save_slide(slide):
     # Ensure file extension exists
     if 'file_extension' not in slide:
         slide['file_extension'] = os.path.splitext(slide['file'])[1].lower()
@@ -63,10 +177,146 @@ def save_slide(slide):
             '.pptx': 'application/vnd.openxmlformats-officedocument.presentationml.presentation'
         }.get(slide['file_extension'], 'application/pdf')
     
-    slides = load_slides()
-    slides.append(slide)
-    with open(DB_FILE, 'w', encoding='utf-8') as f:
-        json.dump(slides, f, indent=2, ensure_ascii=False)
+    await catalog.add(slide)
+
+# Telegram faylları bir dəfə yükləndikdən sonra file_id ilə yenidən göndərilir
+async def send_slide_document(bot, chat_id, slide, caption):
+    file_id = slide.get('file_id')
+    if file_id:
+        try:
+            return await bot.send_document(chat_id=chat_id, document=file_id, caption=caption)
+        except BadRequest as e:
+            logger.warning(f"Cached file_id of slide {slide['id']} was rejected, re-uploading: {e}")
+
+    if not os.path.exists(slide['file']):
+        raise FileNotFoundError(f"Slide file not found: {slide['file']}")
+    file_extension = os.path.splitext(slide['file'])[1].lower()
+    with open(slide['file'], 'rb') as f:
+        message = await bot.send_document(
+            chat_id=chat_id,
+            document=f,
+            filename=f"{slide['name']}{file_extension}",
+            caption=caption
+        )
+    if catalog.get(slide['id']):
+        await catalog.set_meta(slide['id'], file_id=message.document.file_id)
+    return message
+
+# Telegram albomda ən çox 10 şəkil və 1024 simvolluq başlıq qəbul edir
+MAX_ALBUM_SIZE = 10
+MAX_CAPTION_LENGTH = 1024
+
+def _image_key(path, rendition):
+    return f"{path}#{rendition}" if rendition else path
+
+async def _album_files(paths, image_ids, rendition):
+    """{image key: local file to upload} for previews without a cached file_id."""
+    files = {}
+    for path in paths:
+        key = _image_key(path, rendition)
+        if key in image_ids:
+            continue
+        files[key] = path
+        if rendition:
+            try:
+                files[key] = await thumbnail_cache.get(path, rendition)
+            except Exception as e:
+                logger.warning(f"Could not render {rendition} thumbnail of {path}, sending original: {e}")
+    return files
+
+async def _send_album(bot, chat_id, keys, files, image_ids, caption, parse_mode):
+    with ExitStack() as stack:
+        media = [image_ids.get(key) or stack.enter_context(open(files[key], 'rb')) for key in keys]
+        if len(media) == 1:
+            message = await bot.send_photo(chat_id=chat_id, photo=media[0], caption=caption, parse_mode=parse_mode)
+            return [message]
+        items = [
+            InputMediaPhoto(item, caption=caption, parse_mode=parse_mode) if i == 0 else InputMediaPhoto(item)
+            for i, item in enumerate(media)
+        ]
+        return list(await bot.send_media_group(chat_id=chat_id, media=items))
+
+async def send_preview_group(bot, chat_id, record, caption=None, parse_mode=None, rendition=None):
+    """Send the preview images of a slide or pending upload as one album captioned with `caption`.
+
+    With `rendition` ('small' or 'medium') a cached smaller copy of each
+    image is sent instead of the stored original. Returns the sent
+    messages; an empty list means there was nothing to send.
+    """
+    image_ids = record.get('image_ids') or {}
+    paths = [
+        p for p in record.get('images', [])
+        if _image_key(p, rendition) in image_ids or os.path.exists(p)
+    ][:MAX_ALBUM_SIZE]
+    if not paths:
+        return []
+    if caption:
+        caption = caption[:MAX_CAPTION_LENGTH]
+
+    keys = [_image_key(p, rendition) for p in paths]
+    try:
+        files = await _album_files(paths, image_ids, rendition)
+        messages = await _send_album(bot, chat_id, keys, files, image_ids, caption, parse_mode)
+    except BadRequest as e:
+        if not any(k in image_ids for k in keys):
+            raise
+        logger.warning(f"Cached preview file_ids were rejected, re-uploading: {e}")
+        image_ids = {}
+        paths = [p for p in paths if os.path.exists(p)]
+        if not paths:
+            return []
+        keys = [_image_key(p, rendition) for p in paths]
+        files = await _album_files(paths, image_ids, rendition)
+        messages = await _send_album(bot, chat_id, keys, files, image_ids, caption, parse_mode)
+
+    new_ids = {k: m.photo[-1].file_id for k, m in zip(keys, messages) if m.photo and k not in image_ids}
+    if new_ids and record.get('id') and catalog.get(record['id']):
+        await catalog.set_meta(record['id'], image_ids={**image_ids, **new_ids})
+    return messages
+
+def find_slide_or_upload(slide_id):
+    """(record, status label) for an approved slide or a pending upload, or (None, None)."""
+    slide = catalog.get(slide_id)
+    if slide:
+        return slide, "təsdiqlənib"
+    upload = next((u for u in pending_uploads.all() if u.get('slide_id') == slide_id), None)
+    return (upload, "gözləyir") if upload else (None, None)
+
+
+async def send_review_package(bot, upload, admin_text, reply_markup, file_id=None, file_extension='.pdf'):
+    """Send a new upload to the admin as one preview album plus one captioned document."""
+    try:
+        sent = await send_preview_group(bot, ADMIN_CHAT_ID, upload, f"Önizləmə: {upload['name']}")
+    except TelegramError as e:
+        logger.error(f"Failed to send preview album to admin: {e}")
+        sent = []
+    if not sent:
+        admin_text += "\n\n⚠️ Önizləmə şəkilləri göndərilə bilmədi."
+
+    caption = admin_text[:MAX_CAPTION_LENGTH]
+    try:
+        if file_id:
+            try:
+                await bot.send_document(chat_id=ADMIN_CHAT_ID, document=file_id,
+                                        caption=caption, reply_markup=reply_markup)
+                return
+            except BadRequest as e:
+                logger.warning(f"Upload file_id was rejected, sending the local file: {e}")
+        with open(upload['file'], 'rb') as f:
+            await bot.send_document(
+                chat_id=ADMIN_CHAT_ID,
+                document=f,
+                filename=f"{upload['name']}{file_extension}",
+                caption=caption,
+                reply_markup=reply_markup
+            )
+    except Exception as e:
+        logger.error(f"Failed to send document to admin: {e}")
+        await bot.send_message(
+            chat_id=ADMIN_CHAT_ID,
+            text=admin_text + f"\n\n⚠️ Document faylı göndərilə bilmədi: {str(e)}",
+            reply_markup=reply_markup
+        )
 
 # -- Error Handler --
 async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -91,8 +341,17 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     logger.info(f"User {user.id} ({user.full_name}) started the bot")
     
+    release_draft_file(user.id)
     context.user_data.clear()
     
+    # Inline axtarışdan gələn keçid: /start slide_<id>
+    if update.message and context.args and context.args[0].startswith("slide_"):
+        slide = catalog.get(context.args[0].replace("slide_", "", 1))
+        if slide:
+            logger.info(f"User {user.id} opened slide {slide['id']} from a deep link")
+            return await show_slide(update.message, context, slide)
+        await update.message.reply_text("Bu slayd artıq mövcud deyil.")
+    
     keyboard = [
         [InlineKeyboardButton("📤 Slayd yüklə", callback_data='upload')],
         [InlineKeyboardButton("🔍 Slayd axtar", callback_data='search')]
@@ -124,7 +383,13 @@ async def handle_choice(update: Update, context: ContextTypes.DEFAULT_TYPE):
         keyboard = [
             [InlineKeyboardButton("📛 Ad ilə axtar", callback_data='search_by_name')],
             [InlineKeyboardButton("📚 Kateqoriya ilə axtar", callback_data='search_by_category')],
-            [InlineKeyboardButton("🌐 Dilə görə axtar", callback_data='search_by_language')]
+            [InlineKeyboardButton("🌐 Dilə görə axtar", callback_data='search_by_language')],
+            [InlineKeyboardButton("🎛 Filtrlərlə axtar", callback_data='search_by_filter')],
+            [InlineKeyboardButton("📖 Məzmuna görə axtar", callback_data='search_by_content')],
+            [
+                InlineKeyboardButton("🔥 Ən çox satılanlar", callback_data='search_top'),
+                InlineKeyboardButton("🆕 Yeni əlavələr", callback_data='search_new')
+            ]
         ]
         await query.message.reply_text(
         "Axtarış üsulunu seçin:\n"
@@ -137,6 +402,7 @@ async def handle_choice(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.message.from_user
     logger.info(f"User {user.id} ({user.full_name}) canceled the operation")
+    release_draft_file(user.id)
     
     await update.message.reply_text(
         "Əməliyyat ləğv edildi. Yenidən başlamaq üçün /start əmrini istifadə edə bilərsiniz.",
@@ -176,36 +442,45 @@ async def handle_file(update: Update, context: ContextTypes.DEFAULT_TYPE):
     logger.info(f"User {user.id} ({user.full_name}) uploaded file: {document.file_name} ({mime_type})")
     
     try:
-        # Faylın orijinal adını və genişlənməsini saxla
-        original_filename = document.file_name
+        # Faylın genişlənməsini təyin et
+        original_filename = document.file_name or ''
         file_extension = os.path.splitext(original_filename)[1].lower()
         
         if file_extension not in ['.pdf', '.ppt', '.pptx']:
            file_extension = supported_types[mime_type]
-        # Əgər faylın genişlənməsi təkrarlanırsa, onu təmizlə
-        if original_filename.lower().endswith(file_extension + file_extension):
-            original_filename = original_filename[:-len(file_extension)]
-        elif not original_filename.lower().endswith(file_extension):
-            original_filename = original_filename + file_extension
-        
-        
-        # Yeni fayl adı yarat
-        filename = f"{uuid4()}_{original_filename}"
-        file_path = os.path.join("downloads", filename)
         
-        logger.debug(f"Saving slide file to: {file_path}")
-        
-        # Faylı yüklə
+        # Faylı yüklə; ad məzmunun SHA-256 heşindən yaranır
         file = await document.get_file()
-        await file.download_to_drive(file_path)
+        file_path, duplicate = await filestore.download(file, file_extension)
+        # Eyni fayllı slayd bu arada silinsə belə fayl diskdə qalmalıdır
+        hold_draft_file(user.id, file_path)
         
         # Faylın düzgün yükləndiyini yoxla
         if not os.path.exists(file_path):
             raise Exception(f"Failed to save file: {file_path}")
         
+        logger.debug(f"Saved slide file to: {file_path} (duplicate: {duplicate})")
+        
         context.user_data['slide_file'] = file_path
         context.user_data['file_type'] = mime_type
         context.user_data['file_extension'] = file_extension
+        context.user_data['duplicate'] = duplicate
+        # Admin yoxlaması üçün fayl yenidən yüklənmir, istifadəçinin göndərdiyi file_id istifadə olunur
+        context.user_data['upload_file_id'] = document.file_id
+
+        # Səhifə sayı və daxili önizləmə şəkli faylın özündən oxunur (PPTX: docProps, PDF: xref)
+        pages, thumbnail = await asyncio.to_thread(file_metadata, file_path)
+        if pages:
+            context.user_data['detected_pages'] = pages
+        if thumbnail:
+            preview_path = f"images/{uuid4()}.jpg"
+            try:
+                _, preview_hash = await image_service.preview(thumbnail, preview_path)
+                context.user_data['default_preview'] = preview_path
+                context.user_data.setdefault('image_hashes', {})[preview_path] = format_hash(preview_hash)
+            except Exception as e:
+                logger.warning(f"Could not use embedded thumbnail of {file_path}: {e}")
+        logger.debug(f"Detected metadata for {file_path}: pages={pages}, thumbnail={bool(thumbnail)}")
         
         await update.message.reply_text("Slaydın adını daxil et:")
         return UPLOAD_NAME
@@ -293,6 +568,19 @@ async def handle_language(update: Update, context: ContextTypes.DEFAULT_TYPE):
     language = query.data.replace("lang_", "")
     logger.info(f"User {query.from_user.id} selected language: {language}")
     context.user_data['language'] = language
+
+    # Səhifə sayı fayldan təyin olunubsa, bu addım keçilir
+    pages = context.user_data.get('detected_pages')
+    if pages:
+        context.user_data['pages'] = pages
+        keyboard = [[InlineKeyboardButton("✏️ Səhifə sayını dəyiş", callback_data="back_to_pages")]]
+        await query.message.reply_text(
+            f"Səhifə sayı fayldan təyin olundu: {pages}\n\n"
+            "Kart nömrənizi daxil edin:\n"
+            "Qeyd: Bu kart nömrəsinə satış baş tutduqda ödənişiniz göndəriləcək.",
+            reply_markup=InlineKeyboardMarkup(keyboard)
+        )
+        return UPLOAD_CARD
     
     await query.message.reply_text(
         "Təqdimatın səhifə sayını daxil edin:\n"
@@ -317,19 +605,20 @@ async def handle_pages(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "Qeyd: Bu kart nömrəsinə satış baş tutduqda ödənişiniz göndəriləcək."
     )
     return UPLOAD_CARD
+
+async def ask_pages(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # Fayldan təyin olunmuş səhifə sayını əl ilə dəyişmək
+    query = update.callback_query
+    await query.answer()
+    await query.message.reply_text(
+        "Təqdimatın səhifə sayını daxil edin:\n"
+        "Rəqəm olaraq yazın (məs: 15)"
+    )
+    return UPLOAD_PAGES
+
 async def handle_card(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if update.callback_query:  # Callback query varsa (geri düyməsinə basılıbsa)
-        query = update.callback_query
-        await query.answer()
-        
-        if query.data == "back_to_pages":
-            # Səhifə sayına qayıt
-            keyboard = [[InlineKeyboardButton("🔙 Geri", callback_data="back_to_language")]]
-            await query.message.reply_text(
-                "Təqdimatın səhifə sayını daxil edin:",
-                reply_markup=InlineKeyboardMarkup(keyboard)
-            )
-            return UPLOAD_PAGES
+        await update.callback_query.answer()
     
     # Normal mesaj gəlibsə (kart nömrəsi daxil edilibsə)
     elif update.message:
@@ -346,6 +635,23 @@ async def handle_card(update: Update, context: ContextTypes.DEFAULT_TYPE):
         
         logger.info(f"User {user.id} entered card number")
         context.user_data['card'] = card
+
+        # Faylın daxili önizləməsi varsa, şəkil göndərmək məcburi deyil
+        default_preview = context.user_data.get('default_preview')
+        if default_preview:
+            images = context.user_data.setdefault('images', [])
+            if default_preview not in images:
+                images.insert(0, default_preview)
+            keyboard = [
+                [InlineKeyboardButton("✅ Tamamla", callback_data='finish_upload')],
+                [InlineKeyboardButton("➕ Daha bir şəkil əlavə et", callback_data='add_more')]
+            ]
+            await update.message.reply_text(
+                "Faylın öz önizləmə şəkli əlavə olundu.\n"
+                "Tamamlaya və ya slayddan əlavə şəkil göndərə bilərsiniz.",
+                reply_markup=InlineKeyboardMarkup(keyboard)
+            )
+            return UPLOAD_IMAGE
         
         # Geri qayıtma düyməsi əlavə et
         keyboard = [[InlineKeyboardButton("🔙 Geri", callback_data="back_to_card")]]
@@ -389,45 +695,9 @@ async def handle_image(update: Update, context: ContextTypes.DEFAULT_TYPE):
         file = await photo.get_file()
         image_bytes = await file.download_as_bytearray()
         
-        # Şəkili Pillow ilə aç və təmizlə
-        image = Image.open(io.BytesIO(image_bytes))
-        
-        # Şəkili RGB formatına çevir
-        image = image.convert("RGB")
-        
-        # Maksimum ölçüsünü təyin et (məsələn, 1280x1280)
-        max_size = (1280, 1280)
-        
-        # Try new Pillow version method first, fall back to old version if needed
-        try:
-            image.thumbnail(max_size, Image.Resampling.LANCZOS)
-        except AttributeError:
-            image.thumbnail(max_size, Image.LANCZOS)
-        
-        # Şəklin ölçüsünü kiçilt (keyfiyyəti azaldaraq)
-        output = io.BytesIO()
-        image.save(output, format="JPEG", quality=70, optimize=True)
-        output.seek(0)
-        
-        # Şəkil ölçüsünü yoxla (Telegram şəkillər üçün 10MB limit var)
-        image_size = len(output.getvalue()) / (1024 * 1024)  # MB olaraq
-        logger.debug(f"Processed image size: {image_size:.2f} MB")
-        
-        if image_size > 10:
-            logger.warning(f"Image size too large: {image_size:.2f} MB, attempting to reduce further")
-            # Daha çox kiçilt
-            output = io.BytesIO()
-            image.save(output, format="JPEG", quality=50, optimize=True)
-            output.seek(0)
-            image_size = len(output.getvalue()) / (1024 * 1024)
-            logger.debug(f"Reduced image size: {image_size:.2f} MB")
-            
-            if image_size > 10:
-                raise Exception(f"Image size still too large after compression: {image_size:.2f} MB")
-        
-        # Şəkili fayl olaraq saxla
-        with open(image_path, 'wb') as f:
-            f.write(output.getvalue())
+        # Şəkil ayrıca prosesdə kiçildilir, sıxılır və fayla yazılır
+        image_size, image_hash = await image_service.preview(image_bytes, image_path)
+        image_size /= 1024 * 1024  # MB olaraq
         
         if not os.path.exists(image_path):
             raise Exception("Failed to save image file")
@@ -438,6 +708,7 @@ async def handle_image(update: Update, context: ContextTypes.DEFAULT_TYPE):
             context.user_data['images'] = []
         
         context.user_data['images'].append(image_path)
+        context.user_data.setdefault('image_hashes', {})[image_path] = format_hash(image_hash)
         
         keyboard = [
             [InlineKeyboardButton("✅ Tamamla", callback_data='finish_upload')],
@@ -504,13 +775,31 @@ async def handle_image_choice(update: Update, context: ContextTypes.DEFAULT_TYPE
                 "card": context.user_data['card'],
                 "file": context.user_data['slide_file'],
                 "images": context.user_data['images'],
+                "image_hashes": context.user_data.get('image_hashes', {}),
                 "owner": user.id,
                 "owner_name": user.full_name,
                 "timestamp": str(query.message.date)
             }
             
+            # Eyni məzmunlu fayl artıq varsa, adminə xəbərdarlıq et
+            duplicates = []
+            if context.user_data.get('duplicate'):
+                duplicates = [(s, "təsdiqlənib") for s in catalog.all() if s.get('file') == pending_upload['file']]
+                duplicates += [(u, "gözləyir") for u in pending_uploads.all() if u.get('file') == pending_upload['file']]
+
+            # Önizləmə şəkilləri başqa slaydlarınkına bənzəyirsə, onları da göstər
+            similar = []
+            for distance, other_id in image_hashes.similar_previews(pending_upload['image_hashes'], PREVIEW_HASH_DISTANCE, slide_id):
+                other, status = find_slide_or_upload(other_id)
+                if other and other.get('file') != pending_upload['file']:
+                    similar.append((other, status, distance))
+            image_hashes.add_previews(slide_id, pending_upload['image_hashes'])
+            
             # Save pending upload
-            save_pending_upload(pending_upload)
+            await save_pending_upload(pending_upload)
+            # Söhbətin istinadı gözləyən yükləməyə keçir
+            if draft_files.pop(user.id, None) is None:
+                filestore.acquire(pending_upload['file'])
             
             # Adminə bildiriş göndər
             admin_text = (
@@ -524,6 +813,16 @@ async def handle_image_choice(update: Update, context: ContextTypes.DEFAULT_TYPE
                 f"Format: {friendly_file_type} ({file_extension})\n"
                 f"Kart: {context.user_data['card']}"
             )
+            if duplicates:
+                admin_text += "\n\n⚠️ Diqqət: eyni fayl artıq yüklənib:\n" + "\n".join(
+                    f"• {d['name']} ({d.get('owner_name', 'Naməlum')}, {status})"
+                    for d, status in duplicates
+                )
+            if similar:
+                admin_text += "\n\n⚠️ Önizləmə şəkilləri bu slaydlara bənzəyir:\n" + "\n".join(
+                    f"• {s['name']} ({s.get('owner_name', 'Naməlum')}, {status}, fərq: {distance} bit)"
+                    for s, status, distance in similar[:5]
+                )
             
             # Təsdiq və Rədd et düymələri
             keyboard = [
@@ -535,69 +834,13 @@ async def handle_image_choice(update: Update, context: ContextTypes.DEFAULT_TYPE
                 ]
             ]
 
-            # Send preview images and notification to admin
-            for image_path in context.user_data['images']:
-                await context.bot.send_photo(
-                    chat_id=ADMIN_CHAT_ID,
-                    photo=open(image_path, 'rb')
-                )
-
-            await context.bot.send_message(
-                chat_id=ADMIN_CHAT_ID,
-                text=admin_text,
-                reply_markup=InlineKeyboardMarkup(keyboard)
+            # Yoxlama paketi: əvvəl önizləmə albomu, sonra məlumat və düymələrlə sənəd
+            await send_review_package(
+                context.bot, pending_upload, admin_text,
+                InlineKeyboardMarkup(keyboard),
+                context.user_data.get('upload_file_id'),
+                context.user_data.get('file_extension', file_extension)
             )
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            # Send the document to admin with correct file extension
-            try:
-                file_extension = context.user_data.get('file_extension', '.pdf')  # Use stored extension, default to .pdf
-                filename = f"{pending_upload['name']}{file_extension}"
-                with open(pending_upload['file'], 'rb') as f:
-                    await context.bot.send_document(
-                        chat_id=ADMIN_CHAT_ID,
-                        document=f,
-                        filename=filename,
-                        reply_markup=reply_markup
-                    )
-            except Exception as e:
-                logger.error(f"Failed to send document to admin: {e}")
-                await context.bot.send_message(
-                    chat_id=ADMIN_CHAT_ID,
-                    text=admin_text + f"\n\n⚠️ Document faylı göndərilə bilmədi: {str(e)}",
-                    reply_markup=reply_markup
-                )
-            
-            # Önizləmə şəkillərini baytlar olaraq göndər
-            for i, img_path in enumerate(pending_upload['images'], start=1):
-                try:
-                    if not os.path.exists(img_path):
-                        logger.error(f"Preview image not found: {img_path}")
-                        await context.bot.send_message(
-                            chat_id=ADMIN_CHAT_ID,
-                            text=f"⚠️ Önizləmə şəkli {i} tapılmadı: {img_path}"
-                        )
-                        continue
-                    
-                    # Şəkili baytlar olaraq oxu
-                    with open(img_path, 'rb') as f:
-                        image_bytes = f.read()
-                        logger.debug(f"Preview image {i} loaded as bytes, size: {len(image_bytes) / 1024:.2f} KB")
-                    
-                    # Şəkili baytlar olaraq göndər
-                    await context.bot.send_photo(
-                        chat_id=ADMIN_CHAT_ID,
-                        photo=image_bytes,
-                        caption=f"Önizləmə şəkli {i} - Slayd: {pending_upload['name']}"
-                    )
-                    logger.info(f"Successfully sent preview image {i} as bytes")
-                
-                except Exception as e:
-                    logger.error(f"Failed to send preview image {i} as bytes: {e}")
-                    await context.bot.send_message(
-                        chat_id=ADMIN_CHAT_ID,
-                        text=f"⚠️ Önizləmə şəkli {i} yüklənə bilmədi."
-                    )
             
             # İstifadəçiyə təsdiq gözləmə mesajı
             await query.message.reply_text(
@@ -630,16 +873,16 @@ async def reject_upload(update: Update, context: ContextTypes.DEFAULT_TYPE):
         slide_id = parts[3]
         
         # Müvəqqəti yükləmələrdən məlumatı tap
-        pending_uploads = load_pending_uploads()
-        upload = next((u for u in pending_uploads if u['user_id'] == user_id and u['slide_id'] == slide_id), None)
+        upload = pending_uploads.get(user_id, slide_id)
         
         if not upload:
             logger.error(f"Pending upload not found for user ID: {user_id}, slide ID: {slide_id}")
             await query.message.reply_text(f"Yükləmə məlumatları tapılmadı (User ID: {user_id}, Slide ID: {slide_id}).")
             return
         
-        # Müvəqqəti yükləmələrdən sil
-        remove_pending_upload(user_id, slide_id)
+        # Müvəqqəti yükləmələrdən sil; fayla başqa istinad yoxdursa, o da silinir
+        await remove_pending_upload(user_id, slide_id)
+        release_slide_file(upload['file'])
         
         # İstifadəçiyə rədd mesajı göndər
         await context.bot.send_message(
@@ -694,6 +937,238 @@ async def handle_search_type(update: Update, context: ContextTypes.DEFAULT_TYPE)
         )
         return SEARCH_LANGUAGE
 
+    elif query.data == 'search_by_filter':
+        context.user_data['filters'] = {}
+        await show_filter_menu(query, context, edit=False)
+        return SEARCH_FILTER
+
+    elif query.data == 'search_by_content':
+        await query.message.reply_text(
+            "Slaydların içində axtarmaq istədiyiniz mövzunu daxil edin:",
+            reply_markup=ReplyKeyboardRemove()
+        )
+        return SEARCH_CONTENT
+
+    elif query.data in ('search_top', 'search_new'):
+        view = 'popular' if query.data == 'search_top' else 'newest'
+        results = sorted_views.top(view, TOP_LIMIT)
+        if not results:
+            await query.message.reply_text("Hələ heç bir slayd yoxdur.")
+            return SEARCH_TYPE
+        title = "🔥 Ən çox satılan slaydlar:" if view == 'popular' else "🆕 Yeni əlavə olunan slaydlar:"
+        return await show_results(query.message, context, results, title, sort=view)
+
+def cached_search(key, compute):
+    return result_cache.get_or_compute(key, catalog.version, compute)
+
+def run_search(kind, query, key, compute):
+    started = time.perf_counter()
+    results = cached_search(key, compute)
+    search_log.record(kind, normalize(query), len(results), time.perf_counter() - started)
+    return results
+
+def sort_by_name(slide_ids):
+    slides = [catalog.get(slide_id) for slide_id in slide_ids]
+    return [s['id'] for s in sorted((s for s in slides if s), key=lambda s: s.get('name', '').lower())]
+
+async def show_results(message, context, slide_ids, title, page=0, field='category', edit=False, sort=None, query=None):
+    """Send one page of search results.
+
+    Only the result ids and the page header are kept in user_data; the
+    slides of the current page are looked up in the catalog when the page
+    is built.
+    """
+    context.user_data['results'] = list(slide_ids)
+    context.user_data['results_title'] = title
+    context.user_data['results_field'] = field
+    context.user_data['results_sort'] = sort
+    context.user_data['results_query'] = query
+    return await show_results_page(message, context, page, edit=edit)
+
+async def show_results_page(message, context, page, edit=False):
+    slide_ids = context.user_data.get('results', [])
+    field = context.user_data.get('results_field', 'category')
+    pages = max(1, -(-len(slide_ids) // RESULTS_PER_PAGE))
+    page = min(max(page, 0), pages - 1)
+    context.user_data['results_page'] = page
+
+    start = page * RESULTS_PER_PAGE
+    keyboard = []
+    snippets = []
+    texts = {}
+    if field == 'content':
+        # Fraqment üçün mətn yalnız bu səhifənin slaydları üçün keşdən oxunur
+        page_slides = [catalog.get(i) for i in slide_ids[start:start + RESULTS_PER_PAGE]]
+        texts = await asyncio.to_thread(read_cached, [s['file'] for s in page_slides if s and s.get('file')], CONTENT_DIR)
+    for i in range(start, min(start + RESULTS_PER_PAGE, len(slide_ids))):
+        slide = catalog.get(slide_ids[i])
+        if not slide:
+            continue
+        if field == 'content':
+            snippet = content_index.snippet(texts.get(slide.get('file')), context.user_data.get('results_query', ''))
+            if snippet:
+                text, match_start, match_end = snippet
+                snippets.append(
+                    f"<b>{html.escape(slide['name'])}</b>\n"
+                    f"{html.escape(text[:match_start])}<b>{html.escape(text[match_start:match_end])}</b>"
+                    f"{html.escape(text[match_end:])}"
+                )
+        if field == 'language':
+            button_text = f"{slide['name']} [{slide.get('language', 'Naməlum')}]"
+        else:
+            button_text = f"{slide['name']} [Kateqoriya: {slide.get('category', 'Naməlum')}]"
+        keyboard.append([InlineKeyboardButton(button_text, callback_data=f"slide_{i}")])
+
+    if len(slide_ids) > 1:
+        current = context.user_data.get('results_sort')
+        keyboard.append([
+            InlineKeyboardButton(f"• {title} •" if view == current else title, callback_data=f"sort_{view}")
+            for view, title in SORT_TITLES.items()
+        ])
+
+    if pages > 1:
+        navigation = []
+        if page > 0:
+            navigation.append(InlineKeyboardButton("⬅️ Əvvəlki", callback_data=f"page_{page - 1}"))
+        if page < pages - 1:
+            navigation.append(InlineKeyboardButton("Növbəti ➡️", callback_data=f"page_{page + 1}"))
+        keyboard.append(navigation)
+
+    keyboard.append([InlineKeyboardButton("🔙 Əsas Menyu", callback_data="main_menu")])
+
+    text = f"{html.escape(context.user_data.get('results_title', 'Axtarış nəticələri:'))}\n"
+    text += f"Cəmi {len(slide_ids)} nəticə"
+    if pages > 1:
+        text += f" (səhifə {page + 1}/{pages})"
+    if snippets:
+        text += "\n\n" + "\n\n".join(snippets)
+
+    if edit:
+        await message.edit_message_text(text, parse_mode="HTML", reply_markup=InlineKeyboardMarkup(keyboard))
+    else:
+        await message.reply_text(text, parse_mode="HTML", reply_markup=InlineKeyboardMarkup(keyboard))
+    return SELECT_SLIDE
+
+async def handle_results_sort(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+
+    view = query.data.replace("sort_", "")
+    if view == context.user_data.get('results_sort'):
+        return SELECT_SLIDE
+    context.user_data['results'] = sorted_views.order(view, context.user_data.get('results', []))
+    context.user_data['results_sort'] = view
+    return await show_results_page(query, context, 0, edit=True)
+
+async def handle_results_page(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+
+    page = int(query.data.replace("page_", ""))
+    return await show_results_page(query, context, page, edit=True)
+
+def filter_options(facet):
+    if facet == 'price':
+        return list(range(len(PRICE_LABELS)))
+    if facet == 'category':
+        # "Digər" ayrıca kateqoriya deyil, istifadəçinin yazdığı adlar üçündür
+        return [c for c in CATEGORIES if c != "Digər"]
+    return {'language': LANGUAGES, 'file_type': FILE_TYPES}[facet]
+
+def filter_label(facet, value):
+    if facet == 'price':
+        return PRICE_LABELS[value]
+    if facet == 'file_type':
+        return value.upper()
+    return value
+
+async def show_filter_menu(query, context, edit=True):
+    selected = context.user_data.setdefault('filters', {})
+    total = len(facets.filter(**selected))
+
+    keyboard = []
+    for facet, title in FACET_TITLES.items():
+        value = selected.get(facet)
+        label = filter_label(facet, value) if value is not None else "hamısı"
+        keyboard.append([InlineKeyboardButton(f"{title}: {label}", callback_data=f"facet_{facet}")])
+    keyboard.append([InlineKeyboardButton(f"✅ Nəticələri göstər ({total})", callback_data="filter_show")])
+    keyboard.append([
+        InlineKeyboardButton("♻️ Sıfırla", callback_data="filter_reset"),
+        InlineKeyboardButton("🔙 Əsas Menyu", callback_data="main_menu")
+    ])
+
+    text = "Filtrləri seçin və nəticələri göstərin:"
+    if edit:
+        await query.edit_message_text(text, reply_markup=InlineKeyboardMarkup(keyboard))
+    else:
+        await query.message.reply_text(text, reply_markup=InlineKeyboardMarkup(keyboard))
+
+async def handle_filter_facet(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+
+    facet = query.data.replace("facet_", "", 1)
+    selected = context.user_data.setdefault('filters', {})
+    counts = facets.counts(facet, **selected)
+
+    # Hər düymədə digər filtrlərlə birlikdə neçə nəticə olacağı göstərilir
+    buttons = [
+        InlineKeyboardButton(
+            f"{filter_label(facet, value)} ({counts.get(FacetIndex.key(facet, value), 0)})",
+            callback_data=f"filter_{facet}_{i}"
+        )
+        for i, value in enumerate(filter_options(facet))
+    ]
+    keyboard = [buttons[i:i + 3] for i in range(0, len(buttons), 3)]
+    keyboard.append([
+        InlineKeyboardButton("Hamısı", callback_data=f"filter_{facet}_any"),
+        InlineKeyboardButton("🔙 Geri", callback_data="filter_menu")
+    ])
+
+    await query.edit_message_text(
+        f"{FACET_TITLES[facet]} seçin:",
+        reply_markup=InlineKeyboardMarkup(keyboard)
+    )
+    return SEARCH_FILTER
+
+async def handle_filter_value(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+
+    selected = context.user_data.setdefault('filters', {})
+    if query.data == 'filter_reset':
+        selected.clear()
+    elif query.data != 'filter_menu':
+        match = re.match(r'^filter_(category|language|file_type|price)_(\d+|any)$', query.data)
+        facet, choice = match.groups()
+        if choice == 'any':
+            selected.pop(facet, None)
+        else:
+            selected[facet] = filter_options(facet)[int(choice)]
+
+    await show_filter_menu(query, context)
+    return SEARCH_FILTER
+
+async def handle_filter_show(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+
+    selected = context.user_data.setdefault('filters', {})
+    summary = ", ".join(filter_label(f, v) for f, v in selected.items()) or "bütün slaydlar"
+
+    logger.info(f"User {query.from_user.id} searched with filters: {selected}")
+
+    key = tuple(sorted((f, FacetIndex.key(f, v)) for f, v in selected.items()))
+    results = run_search('filter', summary, ('filter', key), lambda: sort_by_name(facets.filter(**selected)))
+
+    if not results:
+        await query.message.reply_text(
+            f"'{summary}' üzrə heç bir nəticə tapılmadı. Filtrləri dəyişib yenidən cəhd edin."
+        )
+        return SEARCH_FILTER
+
+    return await show_results(query.message, context, results, f"'{summary}' üzrə nəticələr:")
+
 async def handle_search_by_language(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
@@ -702,10 +1177,10 @@ async def handle_search_by_language(update: Update, context: ContextTypes.DEFAUL
     
     logger.info(f"User {query.from_user.id} searched by language: {language}")
     
-    slides = load_slides()
-    results = [slide for slide in slides if slide.get('language', '').lower() == language.lower()]
-    
-    context.user_data['results'] = results
+    results = run_search(
+        'language', language, ('language', FacetIndex.key('language', language)),
+        lambda: sort_by_name(facets.ids('language', language))
+    )
     
     if not results:
         await query.message.reply_text(
@@ -714,18 +1189,7 @@ async def handle_search_by_language(update: Update, context: ContextTypes.DEFAUL
         )
         return ConversationHandler.END
     
-    keyboard = []
-    for i, slide in enumerate(results):
-        button_text = f"{slide['name']} [{slide.get('language', 'Naməlum')}]"
-        keyboard.append([InlineKeyboardButton(button_text, callback_data=f"slide_{i}")])
-    
-    keyboard.append([InlineKeyboardButton("🔙 Əsas Menyu", callback_data="main_menu")])
-    
-    await query.message.reply_text(
-        f"'{language}' dilində {len(results)} təqdimat tapıldı:",
-        reply_markup=InlineKeyboardMarkup(keyboard)
-    )
-    return SELECT_SLIDE
+    return await show_results(query.message, context, results, f"'{language}' dilində təqdimatlar:", field='language')
 
 async def handle_search_by_name(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not update.message:
@@ -733,7 +1197,7 @@ async def handle_search_by_name(update: Update, context: ContextTypes.DEFAULT_TY
         return SEARCH_TYPE
     
     user = update.message.from_user
-    name = update.message.text.lower().strip()
+    name = update.message.text.strip()
     
     if not name:
         await update.message.reply_text("Slayd adı boş ola bilməz. Zəhmət olmasa slaydın adını daxil edin:")
@@ -741,35 +1205,92 @@ async def handle_search_by_name(update: Update, context: ContextTypes.DEFAULT_TY
     
     logger.info(f"User {user.id} ({user.full_name}) searched by name: {name}")
     
-    slides = load_slides()
-    results = [
-        slide for slide in slides
-        if name in slide['name'].lower()
-    ]
-    
-    context.user_data['results'] = results
+    results = run_search('name', name, ('name', normalize(name)), lambda: name_index.search(name))
     
     if not results:
+        suggestions = suggester.suggest(name)
+        if suggestions:
+            # Yalnız bir neçə qısa mətn saxlanılır, düymələr onlara indekslə istinad edir
+            context.user_data['suggestions'] = suggestions
+            keyboard = [
+                [InlineKeyboardButton(
+                    f"📚 {text}" if kind == 'category' else f"🔎 {text}",
+                    callback_data=f"suggest_{i}"
+                )]
+                for i, (kind, text) in enumerate(suggestions)
+            ]
+            await update.message.reply_text(
+                f"'{name}' adına uyğun heç bir nəticə tapılmadı. Bunlardan birini nəzərdə tuturdunuz?\n"
+                "Və ya yeni axtarış üçün başqa ad daxil edin.",
+                reply_markup=InlineKeyboardMarkup(keyboard)
+            )
+            return SEARCH_TYPE
+
         await update.message.reply_text(
             f"'{name}' adına uyğun heç bir nəticə tapılmadı.\n"
             "Yeni axtarış üçün başqa ad daxil edin və ya /start yazaraq əsas menyuya qayıdın."
         )
         return SEARCH_TYPE
     
-    keyboard = []
-    for i, slide in enumerate(results):
-        # "category" sahəsinin mövcudluğunu yoxla və varsayılan dəyər təyin et
-        category = slide.get('category', 'Naməlum')
-        button_text = f"{slide['name']} [Kateqoriya: {category}]"
-        keyboard.append([InlineKeyboardButton(button_text, callback_data=f"slide_{i}")])
-    
-    keyboard.append([InlineKeyboardButton("🔙 Əsas Menyu", callback_data="main_menu")])
-    
-    await update.message.reply_text(
-        f"'{name}' adına uyğun {len(results)} nəticə tapıldı:",
-        reply_markup=InlineKeyboardMarkup(keyboard)
+    return await show_results(update.message, context, results, f"'{name}' adına uyğun nəticələr:")
+
+async def handle_suggestion(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+
+    suggestions = context.user_data.get('suggestions') or []
+    index = int(query.data.replace("suggest_", ""))
+    if index >= len(suggestions):
+        await query.message.reply_text("Təklif artıq keçərli deyil. Zəhmət olmasa yenidən axtarın.")
+        return SEARCH_TYPE
+    kind, text = suggestions[index]
+
+    logger.info(f"User {query.from_user.id} picked suggestion: {kind} '{text}'")
+
+    if kind == 'category':
+        results = run_search(
+            'category', text, ('category', FacetIndex.key('category', text)),
+            lambda: sort_by_name(facets.ids('category', text))
+        )
+        title = f"'{text}' kateqoriyasında nəticələr:"
+    else:
+        results = run_search('name', text, ('name', normalize(text)), lambda: name_index.search(text))
+        title = f"'{text}' adına uyğun nəticələr:"
+
+    if not results:
+        await query.message.reply_text("Bu təklif üzrə artıq nəticə yoxdur. Zəhmət olmasa yenidən axtarın.")
+        return SEARCH_TYPE
+
+    return await show_results(query.message, context, results, title)
+
+async def handle_search_by_content(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not update.message:
+        logger.error("No message found in update")
+        return SEARCH_CONTENT
+
+    user = update.message.from_user
+    text = update.message.text.strip()
+
+    if not text:
+        await update.message.reply_text("Mövzu boş ola bilməz. Zəhmət olmasa axtarmaq istədiyiniz mövzunu daxil edin:")
+        return SEARCH_CONTENT
+
+    logger.info(f"User {user.id} ({user.full_name}) searched by content: {text}")
+
+    results = run_search(
+        'content', text, ('content', content_index.version, normalize(text)),
+        lambda: [i for i in content_index.search(text) if catalog.get(i)]
     )
-    return SELECT_SLIDE
+
+    if not results:
+        await update.message.reply_text(
+            f"Məzmununda '{text}' olan heç bir slayd tapılmadı.\n"
+            "Başqa mövzu daxil edin və ya /start yazaraq əsas menyuya qayıdın."
+        )
+        return SEARCH_CONTENT
+
+    return await show_results(update.message, context, results, f"Məzmununda '{text}' olan slaydlar:",
+                              field='content', query=text)
 
 async def handle_search_category(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
@@ -783,15 +1304,10 @@ async def handle_search_category(update: Update, context: ContextTypes.DEFAULT_T
     
     logger.info(f"User {query.from_user.id} searched by category: {category}")
     
-    slides = load_slides()
-    results = []
-    for slide in slides:
-        # 'category' sahəsinin mövcudluğunu yoxla, yoxdursa boş string qaytar
-        slide_category = slide.get('category', '').lower()
-        if slide_category == category.lower():
-            results.append(slide)
-    
-    context.user_data['results'] = results
+    results = run_search(
+        'category', category, ('category', FacetIndex.key('category', category)),
+        lambda: sort_by_name(facets.ids('category', category))
+    )
     
     if not results:
         await query.message.reply_text(
@@ -800,18 +1316,7 @@ async def handle_search_category(update: Update, context: ContextTypes.DEFAULT_T
         )
         return SEARCH_TYPE
     
-    keyboard = []
-    for i, slide in enumerate(results):
-        button_text = f"{slide['name']} [Kateqoriya: {slide.get('category', 'Naməlum')}]"
-        keyboard.append([InlineKeyboardButton(button_text, callback_data=f"slide_{i}")])
-    
-    keyboard.append([InlineKeyboardButton("🔙 Əsas Menyu", callback_data="main_menu")])
-    
-    await query.message.reply_text(
-        f"'{category}' kateqoriyasında {len(results)} nəticə tapıldı:",
-        reply_markup=InlineKeyboardMarkup(keyboard)
-    )
-    return SELECT_SLIDE
+    return await show_results(query.message, context, results, f"'{category}' kateqoriyasında nəticələr:")
 
 async def handle_search_other_category(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not update.message:
@@ -819,7 +1324,7 @@ async def handle_search_other_category(update: Update, context: ContextTypes.DEF
         return SEARCH_OTHER_CATEGORY
     
     user = update.message.from_user
-    category = update.message.text.lower().strip()
+    category = update.message.text.strip()
     
     if not category:
         await update.message.reply_text("Kateqoriya adı boş ola bilməz. Zəhmət olmasa kateqoriya adını daxil edin:")
@@ -827,15 +1332,10 @@ async def handle_search_other_category(update: Update, context: ContextTypes.DEF
     
     logger.info(f"User {user.id} ({user.full_name}) searched by custom category: {category}")
     
-    slides = load_slides()
-    results = []
-    for slide in slides:
-        # 'category' sahəsinin mövcudluğunu yoxla və varsayılan dəyər təyin et
-        slide_category = slide.get('category', '').lower()
-        if slide_category == category:
-            results.append(slide)
-    
-    context.user_data['results'] = results
+    results = run_search(
+        'category', category, ('category', FacetIndex.key('category', category)),
+        lambda: sort_by_name(facets.ids('category', category))
+    )
     
     if not results:
         await update.message.reply_text(
@@ -844,18 +1344,7 @@ async def handle_search_other_category(update: Update, context: ContextTypes.DEF
         )
         return SEARCH_TYPE
     
-    keyboard = []
-    for i, slide in enumerate(results):
-        button_text = f"{slide['name']} [Kateqoriya: {slide.get('category', 'Naməlum')}]"
-        keyboard.append([InlineKeyboardButton(button_text, callback_data=f"slide_{i}")])
-    
-    keyboard.append([InlineKeyboardButton("🔙 Əsas Menyu", callback_data="main_menu")])
-    
-    await update.message.reply_text(
-        f"'{category}' kateqoriyasında {len(results)} nəticə tapıldı:",
-        reply_markup=InlineKeyboardMarkup(keyboard)
-    )
-    return SELECT_SLIDE
+    return await show_results(update.message, context, results, f"'{category}' kateqoriyasında nəticələr:")
 
 async def handle_search_category(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
@@ -869,15 +1358,10 @@ async def handle_search_category(update: Update, context: ContextTypes.DEFAULT_T
     
     logger.info(f"User {query.from_user.id} searched by category: {category}")
     
-    slides = load_slides()
-    results = []
-    for slide in slides:
-        # 'category' sahəsinin mövcudluğunu yoxla, yoxdursa boş string qaytar
-        slide_category = slide.get('category', '').lower()
-        if slide_category == category.lower():
-            results.append(slide)
-    
-    context.user_data['results'] = results
+    results = run_search(
+        'category', category, ('category', FacetIndex.key('category', category)),
+        lambda: sort_by_name(facets.ids('category', category))
+    )
     
     if not results:
         await query.message.reply_text(
@@ -886,18 +1370,59 @@ async def handle_search_category(update: Update, context: ContextTypes.DEFAULT_T
         )
         return SEARCH_TYPE
     
-    keyboard = []
-    for i, slide in enumerate(results):
-        button_text = f"{slide['name']} [Kateqoriya: {slide.get('category', 'Naməlum')}]"
-        keyboard.append([InlineKeyboardButton(button_text, callback_data=f"slide_{i}")])
-    
-    keyboard.append([InlineKeyboardButton("🔙 Əsas Menyu", callback_data="main_menu")])
-    
-    await query.message.reply_text(
-        f"'{category}' kateqoriyasında {len(results)} nəticə tapıldı:",
-        reply_markup=InlineKeyboardMarkup(keyboard)
+    return await show_results(query.message, context, results, f"'{category}' kateqoriyasında nəticələr:")
+# -- Inline Mode --
+async def inline_search(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    inline_query = update.inline_query
+    text = inline_query.query.strip()
+    if not text:
+        await inline_query.answer([], cache_time=INLINE_CACHE_TIME)
+        return
+
+    try:
+        offset = int(inline_query.offset or 0)
+    except ValueError:
+        offset = 0
+
+    # Yalnız bu səhifəyə qədər olan nəticələr sıralanır; bir artıq nəticə növbəti səhifənin varlığını göstərir
+    limit = offset + INLINE_PAGE_SIZE + 1
+    key = ('name', normalize(text), limit)
+    if offset:
+        results = cached_search(key, lambda: name_index.search(text, limit=limit))
+    else:
+        results = run_search('inline', text, key, lambda: name_index.search(text, limit=limit))
+    page = results[offset:offset + INLINE_PAGE_SIZE]
+    next_offset = str(offset + INLINE_PAGE_SIZE) if len(results) == limit else ""
+
+    articles = []
+    for slide_id in page:
+        slide = catalog.get(slide_id)
+        if not slide:
+            continue
+        link = f"https://t.me/{context.bot.username}?start=slide_{slide_id}"
+        articles.append(InlineQueryResultArticle(
+            id=slide_id,
+            title=slide['name'],
+            description=(
+                f"{slide.get('category', 'Naməlum')} • {slide.get('language', 'Naməlum')} • "
+                f"{slide.get('price', 0)} AZN"
+            ),
+            input_message_content=InputTextMessageContent(
+                f"📝 {slide['name']}\n"
+                f"📌 Kateqoriya: {slide.get('category', 'Naməlum')}\n"
+                f"💰 Qiymət: {slide.get('price', 0)} AZN"
+            ),
+            reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔍 Botda aç", url=link)]])
+        ))
+
+    # Nəticələr istifadəçidən asılı deyil, Telegram hamı üçün eyni cavabı saxlaya bilər
+    await inline_query.answer(
+        articles,
+        cache_time=INLINE_CACHE_TIME,
+        is_personal=False,
+        next_offset=next_offset
     )
-    return SELECT_SLIDE
+
 async def back_to_results(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
@@ -913,18 +1438,7 @@ async def back_to_results(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return SEARCH_TYPE
     
-    keyboard = []
-    for i, slide in enumerate(context.user_data['results']):
-        button_text = f"{slide['name']} [Kateqoriya: {slide['category']}]"
-        keyboard.append([InlineKeyboardButton(button_text, callback_data=f"slide_{i}")])
-    
-    keyboard.append([InlineKeyboardButton("🔙 Əsas Menyu", callback_data="main_menu")])
-    
-    await query.message.reply_text(
-        f"Axtarış nəticələri:",
-        reply_markup=InlineKeyboardMarkup(keyboard)
-    )
-    return SELECT_SLIDE
+    return await show_results_page(query.message, context, context.user_data.get('results_page', 0))
 
 async def request_payment(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
@@ -953,6 +1467,46 @@ async def request_payment(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
     return CONFIRM_PAYMENT
 
+async def show_slide(message, context, slide):
+    context.user_data['selected_slide'] = slide
+    
+    # Get values with defaults if fields don't exist
+    category = slide.get('category', 'Naməlum')
+    price = slide.get('price', 0)  # Default price is 0 if not set
+    
+    info_text = (
+        f"📝 *{slide['name']}*\n\n"
+        f"📌 *Kateqoriya:* {category}\n"
+        f"🌐 *Dil:* {slide.get('language', 'Qeyd edilməyib')}\n"
+        f"📄 *Səhifə sayı:* {slide.get('pages', 'Qeyd edilməyib')}\n"
+        f"💰 *Qiymət:* {price} AZN\n"
+        f"💳 *Kart nömrəsi:* `4098584494745886`\n"
+    )
+    
+    # Önizləmə şəkilləri və məlumat kartı bir albom kimi göndərilir
+    sent = []
+    try:
+        sent = await send_preview_group(context.bot, message.chat_id, slide, info_text, parse_mode="Markdown", rendition='small')
+    except Exception as e:
+        logger.error(f"Error sending preview images: {e}")
+    
+    if not sent:
+        await message.reply_text(
+            info_text,
+            parse_mode="Markdown"
+        )
+    
+    keyboard = [
+        [InlineKeyboardButton("✅ Təqdimatı al", callback_data="buy")],
+        [InlineKeyboardButton("🔙 Geri", callback_data="back_to_results")]
+    ]
+    
+    await message.reply_text(
+        "Nə etmək istəyirsiniz?",
+        reply_markup=InlineKeyboardMarkup(keyboard)
+    )
+    return CONFIRM_PAYMENT
+
 async def view_selected_slide(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
@@ -970,56 +1524,12 @@ async def view_selected_slide(update: Update, context: ContextTypes.DEFAULT_TYPE
     
     try:
         index = int(query.data.split('_')[1])
-        slide = context.user_data['results'][index]
-        context.user_data['selected_slide'] = slide
-        
+        slide = catalog.get(context.user_data['results'][index])
+        if not slide:
+            await query.message.reply_text("Bu slayd artıq mövcud deyil. Zəhmət olmasa başqa nəticə seçin.")
+            return SELECT_SLIDE
         logger.info(f"User {query.from_user.id} ({query.from_user.full_name}) selected slide: {slide['name']}")
-        
-        # Get values with defaults if fields don't exist
-        category = slide.get('category', 'Naməlum')
-        price = slide.get('price', 0)  # Default price is 0 if not set
-        
-        info_text = (
-            f"📝 *{slide['name']}*\n\n"
-            f"📌 *Kateqoriya:* {category}\n"
-            f"🌐 *Dil:* {slide.get('language', 'Qeyd edilməyib')}\n"
-            f"📄 *Səhifə sayı:* {slide.get('pages', 'Qeyd edilməyib')}\n"
-            f"💰 *Qiymət:* {price} AZN\n"
-            f"💳 *Kart nömrəsi:* `4098584494745886`\n"
-        )
-        
-        # Önizləmə şəkillərini göndər
-        if 'images' in slide and slide['images']:
-            for i, img_path in enumerate(slide['images'], start=1):
-                try:
-                    if not os.path.exists(img_path):
-                        logger.error(f"Image file not found: {img_path}")
-                        continue
-                        
-                    with open(img_path, 'rb') as f:
-                        await query.message.reply_photo(
-                            photo=f,
-                            parse_mode="Markdown"
-                        )
-                except Exception as e:
-                    logger.error(f"Error sending preview image {i}: {e}")
-                    continue
-        
-        await query.message.reply_text(
-            info_text,
-            parse_mode="Markdown"
-        )
-        
-        keyboard = [
-            [InlineKeyboardButton("✅ Təqdimatı al", callback_data="buy")],
-            [InlineKeyboardButton("🔙 Geri", callback_data="back_to_results")]
-        ]
-        
-        await query.message.reply_text(
-            "Nə etmək istəyirsiniz?",
-            reply_markup=InlineKeyboardMarkup(keyboard)
-        )
-        return CONFIRM_PAYMENT
+        return await show_slide(query.message, context, slide)
         
     except Exception as e:
         logger.error(f"Error in view_selected_slide: {str(e)}")
@@ -1038,27 +1548,22 @@ async def reject_payment(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     
     try:
-        user_id = int(query.data.split('_')[-1])
+        payment_id = query.data.split('_')[-1]
         
-        # payments.json faylını yoxla
-        if not os.path.exists('payments.json'):
-            logger.error("Payments file not found")
-            await query.message.reply_text("Ödəniş məlumatları faylı tapılmadı.")
+        payment = ledger.resolve(payment_id)
+        if not payment:
+            logger.error(f"Payment data not found for ID: {payment_id}")
+            await query.message.reply_text(f"Ödəniş məlumatları tapılmadı (ID: {payment_id}).")
             return
         
-        with open('payments.json', 'r', encoding='utf-8') as f:
-            payments = json.load(f)
-        
-        payment = next((p for p in payments if p['user_id'] == user_id), None)
-        if not payment:
-            logger.error(f"Payment data not found for user ID: {user_id}")
-            await query.message.reply_text(f"Ödəniş məlumatları tapılmadı (ID: {user_id}).")
+        if payment['status'] != PENDING:
+            await query.message.reply_text(f"Bu ödəniş artıq emal olunub (status: {payment['status']}).")
             return
         
-        # Ödənişi payments.json-dan sil
-        payments = [p for p in payments if p['user_id'] != user_id]
-        with open('payments.json', 'w', encoding='utf-8') as f:
-            json.dump(payments, f, indent=2, ensure_ascii=False)
+        user_id = payment['user_id']
+        
+        # Ödənişi tarixçə üçün saxla, statusunu dəyiş
+        await ledger.set_status(payment['id'], REJECTED)
         
         # İstifadəçiyə rədd mesajı göndər
         await context.bot.send_message(
@@ -1068,9 +1573,9 @@ async def reject_payment(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         
         # Adminə rədd mesajı
-        await query.message.reply_text(f"✅ Ödəniş (ID: {user_id}) rədd edildi.")
+        await query.message.reply_text(f"✅ Ödəniş (ID: {payment['id']}) rədd edildi.")
         
-        logger.info(f"Admin rejected payment for user ID: {user_id}")
+        logger.info(f"Admin rejected payment {payment['id']} for user ID: {user_id}")
         
     except Exception as e:
         logger.error(f"Error rejecting payment: {e}")
@@ -1099,27 +1604,8 @@ async def confirm_payment(update: Update, context: ContextTypes.DEFAULT_TYPE):
         file = await payment_image.get_file()
         image_bytes = await file.download_as_bytearray()
         
-        # Şəkili Pillow ilə aç və optimallaşdır
-        image = Image.open(io.BytesIO(image_bytes))
-        image = image.convert("RGB")  # RGB formatına çevir
-        
-        # Maksimum ölçüsünü təyin et (məsələn, 640x640)
-        max_size = (640, 640)
-        image.thumbnail(max_size, Image.Resampling.LANCZOS)
-        
-        # Bütün metadata-nı təmizlə
-        image_info = image.info.copy()
-        image_info.pop('exif', None)
-        image_info.pop('icc_profile', None)
-        
-        # Şəkili JPEG olaraq saxla
-        output = io.BytesIO()
-        image.save(output, format="JPEG", quality=70, optimize=True, **image_info)
-        output.seek(0)
-        
-        # Şəkili fayl olaraq saxla
-        with open(image_path, 'wb') as f:
-            f.write(output.getvalue())
+        # Şəkil ayrıca prosesdə kiçildilir, metadata təmizlənir və fayla yazılır
+        _, receipt_hash = await image_service.receipt(image_bytes, image_path)
         
         # Faylın düzgün saxlanıb-saxlanmadığını yoxla
         if not os.path.exists(image_path):
@@ -1132,20 +1618,25 @@ async def confirm_payment(update: Update, context: ContextTypes.DEFAULT_TYPE):
         # Ödəniş məlumatlarını faylda saxla
         payment_data = {
             'user_id': user.id,
+            'slide_id': slide['id'],
             'slide_file': slide['file'],
             'slide_name': slide['name'],
             'timestamp': str(update.message.date),
-            'payment_image': image_path
+            'payment_image': image_path,
+            'receipt_unique_id': payment_image.file_unique_id,
+            'receipt_sha256': hashlib.sha256(image_bytes).hexdigest(),
+            'receipt_hash': format_hash(receipt_hash)
         }
-        if not os.path.exists('payments.json'):
-            with open('payments.json', 'w', encoding='utf-8') as f:
-                json.dump([], f, indent=2, ensure_ascii=False)
-        
-        with open('payments.json', 'r', encoding='utf-8') as f:
-            payments = json.load(f)
-        payments.append(payment_data)
-        with open('payments.json', 'w', encoding='utf-8') as f:
-            json.dump(payments, f, indent=2, ensure_ascii=False)
+        # Eyni qəbz əvvəlki ödənişlərdə istifadə olunubsa, adminə göstər
+        same_ids = image_hashes.same_receipts(payment_data)
+        reused = [ledger.get(payment_id) for payment_id in same_ids]
+        similar = [(ledger.get(payment_id), distance)
+                   for distance, payment_id in image_hashes.similar_receipts(payment_data['receipt_hash'], RECEIPT_HASH_DISTANCE)
+                   if payment_id not in same_ids]
+        reused = [p for p in reused if p]
+        similar = [(p, distance) for p, distance in similar if p]
+        payment = await ledger.create(payment_data)
+        image_hashes.add_receipt(payment)
         
         admin_text = (
             f"💸 Yeni ödəniş!\n"
@@ -1154,12 +1645,22 @@ async def confirm_payment(update: Update, context: ContextTypes.DEFAULT_TYPE):
             f"Satıcı: {slide.get('owner_name', 'Naməlum')} (ID: {slide.get('owner', 'Naməlum')})\n"
             f"Kart: {slide['card']}\n"
         )
+        if reused:
+            admin_text += "\n⚠️ Bu qəbz əvvəl də göndərilib:\n" + "\n".join(
+                f"• {p.get('slide_name', 'Naməlum')} — ID: {p['user_id']}, {p['status']}, {p['timestamp'][:16]}"
+                for p in reused[:5]
+            )
+        if similar:
+            admin_text += "\n⚠️ Bu qəbz əvvəlki qəbzlərə çox bənzəyir:\n" + "\n".join(
+                f"• {p.get('slide_name', 'Naməlum')} — ID: {p['user_id']}, {p['status']}, {p['timestamp'][:16]}, fərq: {distance} bit"
+                for p, distance in similar[:5]
+            )
         
         # Təsdiq və Rədd et düymələri
         keyboard = [
             [
-                InlineKeyboardButton("✅ Təsdiq Et", callback_data=f"approve_payment_{user.id}"),
-                InlineKeyboardButton("❌ Rədd Et", callback_data=f"reject_payment_{user.id}")
+                InlineKeyboardButton("✅ Təsdiq Et", callback_data=f"approve_payment_{payment['id']}"),
+                InlineKeyboardButton("❌ Rədd Et", callback_data=f"reject_payment_{payment['id']}")
             ]
         ]
         reply_markup = InlineKeyboardMarkup(keyboard)
@@ -1171,7 +1672,7 @@ async def confirm_payment(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await context.bot.send_photo(
                 chat_id=ADMIN_CHAT_ID,
                 photo=image_bytes,
-                caption=admin_text,
+                caption=admin_text[:MAX_CAPTION_LENGTH],
                 reply_markup=reply_markup
             )
             logger.info("Successfully sent payment image as bytes with buttons")
@@ -1207,34 +1708,38 @@ async def approve_payment(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     try:
-        user_id = int(query.data.split('_')[2])
-        
-        # Load payments
-        with open('payments.json', 'r', encoding='utf-8') as f:
-            payments = json.load(f)
+        payment_id = query.data.split('_')[2]
         
         # Find payment
-        payment = next((p for p in payments if p['user_id'] == user_id), None)
+        payment = ledger.resolve(payment_id)
         if not payment:
-            raise ValueError(f"Payment not found for user ID: {user_id}")
+            raise ValueError(f"Payment not found: {payment_id}")
 
-        # Load slides
-        slides = load_slides()
-        
-        # Find slide
-        slide = next((s for s in slides if s['file'] == payment['slide_file']), None)
-        if not slide:
-            raise ValueError(f"Slide not found: {payment['slide_name']}")
+        # Növbəti await-dən əvvəl ödəniş tutulur ki, ikinci klik onu yenidən təsdiq etməsin
+        if not ledger.claim(payment['id']):
+            await query.message.reply_text(f"Bu ödəniş artıq emal olunub (status: {payment['status']}).")
+            return
 
-        # Update sales count
-        if 'sales' in slide:
-            slide['sales'] += 1
-        else:
-            slide['sales'] = 1
+        user_id = payment['user_id']
 
-        # Save updated slides
-        with open(DB_FILE, 'w', encoding='utf-8') as f:
-            json.dump(slides, f, indent=2, ensure_ascii=False)
+        try:
+            # Find slide
+            slide = catalog.get(payment.get('slide_id')) or catalog.find_by_file(payment['slide_file'])
+            if not slide:
+                raise ValueError(f"Slide not found: {payment['slide_name']}")
+
+            # Send slide to buyer
+            await send_slide_document(context.bot, user_id, slide, f"Təqdimat: {slide['name']}")
+        except Exception:
+            # Fayl göndərilməyibsə, ödəniş yenidən gözləyən vəziyyətə qayıdır
+            ledger.unclaim(payment['id'])
+            raise
+
+        # Mark payment as approved, keeping it for history
+        await ledger.set_status(payment['id'], APPROVED)
+
+        # Update sales count
+        await catalog.increment_sales(slide['id'])
 
         # Calculate seller amount (85% of price)
         seller_amount = float(slide['price']) * 0.85
@@ -1249,61 +1754,25 @@ async def approve_payment(update: Update, context: ContextTypes.DEFAULT_TYPE):
             parse_mode="Markdown"
         )
 
-        # Send slide to buyer
-        if os.path.exists(slide['file']):
-            file_extension = os.path.splitext(slide['file'])[1].lower()
-            with open(slide['file'], 'rb') as f:
-                await context.bot.send_document(
-                    chat_id=user_id,
-                    document=f,
-                    filename=f"{slide['name']}{file_extension}",
-                    caption=f"Təqdimat: {slide['name']}"
-                )
-
-            # Notify buyer
-            await context.bot.send_message(
-                chat_id=user_id,
-                text="✅ Ödənişiniz təsdiqləndi! Slayd faylı yuxarıda göndərildi."
-            )
-
-            # Remove payment record
-            payments = [p for p in payments if p['user_id'] != user_id]
-            with open('payments.json', 'w', encoding='utf-8') as f:
-                json.dump(payments, f, indent=2, ensure_ascii=False)
+        # Notify buyer
+        await context.bot.send_message(
+            chat_id=user_id,
+            text="✅ Ödənişiniz təsdiqləndi! Slayd faylı yuxarıda göndərildi."
+        )
 
-            # Confirm to admin
-            await query.message.reply_text(f"✅ İstifadəçiyə (ID: {user_id}) slayd göndərildi.")
-        else:
-            raise FileNotFoundError(f"Slide file not found: {slide['file']}")
+        # Confirm to admin
+        await query.message.reply_text(f"✅ İstifadəçiyə (ID: {user_id}) slayd göndərildi.")
 
     except Exception as e:
         logger.error(f"Error approving payment: {e}")
         await query.message.reply_text(f"Xəta: {str(e)}")
 
-# Müvəqqəti yükləmələri saxlamaq üçün fayl
-PENDING_UPLOADS_FILE = "pending_uploads.json"
+# Müvəqqəti yükləmələr saxlama qatında saxlanılır
+async def save_pending_upload(upload):
+    await pending_uploads.add(upload)
 
-def load_pending_uploads():
-    if os.path.exists(PENDING_UPLOADS_FILE):
-        try:
-            with open(PENDING_UPLOADS_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except json.JSONDecodeError:
-            logger.error(f"Error decoding {PENDING_UPLOADS_FILE}. Creating empty database.")
-            return []
-    return []
-
-def save_pending_upload(upload):
-    uploads = load_pending_uploads()
-    uploads.append(upload)
-    with open(PENDING_UPLOADS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(uploads, f, indent=2, ensure_ascii=False)
-
-def remove_pending_upload(user_id, slide_id):
-    uploads = load_pending_uploads()
-    uploads = [upload for upload in uploads if not (upload['user_id'] == user_id and upload['slide_id'] == slide_id)]
-    with open(PENDING_UPLOADS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(uploads, f, indent=2, ensure_ascii=False)
+async def remove_pending_upload(user_id, slide_id):
+    await pending_uploads.remove(user_id, slide_id)
 
 
 async def approve_upload(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -1320,8 +1789,7 @@ async def approve_upload(update: Update, context: ContextTypes.DEFAULT_TYPE):
         slide_id = parts[3]
         
         # Müvəqqəti yükləmələrdən məlumatı tap
-        pending_uploads = load_pending_uploads()
-        upload = next((u for u in pending_uploads if u['user_id'] == user_id and u['slide_id'] == slide_id), None)
+        upload = pending_uploads.get(user_id, slide_id)
         
         if not upload:
             logger.error(f"Pending upload not found for user ID: {user_id}, slide ID: {slide_id}")
@@ -1341,13 +1809,17 @@ async def approve_upload(update: Update, context: ContextTypes.DEFAULT_TYPE):
             "file_type": upload.get('file_type', 'application/pdf'), 
             "file_type": file_extension.replace('.', ''),
             "images": upload['images'],
+            "image_hashes": upload.get('image_hashes', {}),
             "owner": upload['owner'],
             "owner_name": upload['owner_name'],
             "timestamp": upload['timestamp']
         }
         
-        save_slide(slide)
-        remove_pending_upload(user_id, slide_id)
+        await save_slide(slide)
+        filestore.acquire(slide['file'])
+        await remove_pending_upload(user_id, slide_id)
+        release_slide_file(upload['file'])
+        context.application.create_task(index_slide_content(slide))
         
         # User confirmation message
         await context.bot.send_message(
@@ -1389,6 +1861,9 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "5. Göstərilən karta ödəniş edin və qəbzin şəklini göndərin\n"
         "6. Admin ödənişi təsdiq etdikdən sonra slayd sizə göndəriləcək\n\n"
         
+        "*Inline axtarış:*\n"
+        "İstənilən söhbətdə botun adını (@...) yazıb ardınca slaydın adını daxil edin\n\n"
+        
         "Hər hansı bir probleminiz varsa @UniSlayd ilə əlaqə saxlayın."
     )
     
@@ -1397,6 +1872,42 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         parse_mode="Markdown"
     )
 
+# -- Admin Stats --
+async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if str(update.message.chat_id) != str(ADMIN_CHAT_ID):
+        await update.message.reply_text("Bu əmr yalnız admin üçün əlçatandır.")
+        return
+
+    stats_text = (
+        "📊 Statistika\n\n"
+        f"Slaydlar: {len(catalog)} (kataloq versiyası {catalog.version})\n"
+        f"Ödənişlər: {len(ledger)}\n"
+        f"Gözləyən yükləmələr: {len(pending_uploads)}\n\n"
+        "Axtarış keşi:\n"
+        f"• Qeydlər: {len(result_cache)}/{result_cache.capacity}\n"
+        f"• Hit: {result_cache.hits}, miss: {result_cache.misses} "
+        f"({result_cache.hit_rate():.0%})\n\n"
+        f"Yazılar: {writer.mutations} dəyişiklik, {writer.batches} paket\n"
+        f"Şəkillər: {image_service.processed} emal olunub, {image_service.in_flight} icrada, {image_service.waiting} növbədə\n"
+        f"Miniatürlər: {len(thumbnail_cache)} fayl, {thumbnail_cache.size / (1024 * 1024):.1f}/"
+        f"{thumbnail_cache.budget / (1024 * 1024):.0f} MB, hit: {thumbnail_cache.hits}, miss: {thumbnail_cache.misses}"
+    )
+
+    report = search_log.report()
+    stats_text += (
+        f"\n\n🔎 Son {report['searches']} axtarış\n"
+        f"Gecikmə: p50 {report['p50']:.2f} ms, p95 {report['p95']:.2f} ms\n"
+    )
+    if report['top']:
+        stats_text += "\nƏn çox axtarılanlar:\n" + "\n".join(
+            f"• [{kind}] {query} — {count}" for (kind, query), count in report['top']
+        )
+    if report['zero']:
+        stats_text += "\n\nNəticəsiz axtarışlar:\n" + "\n".join(
+            f"• [{kind}] {query} — {count}" for (kind, query), count in report['zero']
+        )
+    await update.message.reply_text(stats_text)
+
 async def handle_edit_field(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
@@ -1480,20 +1991,13 @@ async def handle_slide_action(update: Update, context: ContextTypes.DEFAULT_TYPE
             return ConversationHandler.END
 
         try:
-            # Load all slides
-            slides = load_slides()
-            
             # Find and remove the slide
-            slides = [s for s in slides if s['id'] != slide['id']]
-            
-            # Save updated slides list
-            with open(DB_FILE, 'w', encoding='utf-8') as f:
-                json.dump(slides, f, indent=2, ensure_ascii=False)
+            await catalog.remove(slide['id'])
+            content_index.discard(slide['id'])
 
-            # Delete associated files
+            # Delete associated files; the slide file may be shared with other slides
             try:
-                if os.path.exists(slide['file']):
-                    os.remove(slide['file'])
+                release_slide_file(slide['file'])
                 for img_path in slide.get('images', []):
                     if os.path.exists(img_path):
                         os.remove(img_path)
@@ -1503,7 +2007,7 @@ async def handle_slide_action(update: Update, context: ContextTypes.DEFAULT_TYPE
             await query.message.reply_text(f"✅ Slayd '{slide['name']}' silindi.")
             
             # Update user's slides list
-            user_slides = [s for s in slides if s['owner'] == query.from_user.id]
+            user_slides = catalog.by_owner(query.from_user.id)
             context.user_data['user_slides'] = user_slides
             
             if user_slides:
@@ -1559,32 +2063,21 @@ async def handle_edit_language(update: Update, context: ContextTypes.DEFAULT_TYP
         # First, update the UI to show processing
         await query.edit_message_text(f"Dil '{language}' olaraq yenilənir... Xahiş edirik gözləyin.")
         
-        # Load slides directly from file to ensure we have latest data
-        slides = load_slides()
-        
-        # Find and update the specific slide
-        updated = False
-        for s in slides:
-            if s['id'] == slide['id']:
-                s['language'] = language
-                # Save the updated slide back to context
-                context.user_data['selected_slide'] = s
-                updated = True
-                break
-        
-        if not updated:
-            await query.edit_message_text("Xəta: Slayd verilənlər bazasında tapılmadı.")
-            return ConversationHandler.END
-
-        # Save all slides with explicit error handling
+        # Find and update the specific slide with explicit error handling
         try:
-            with open(DB_FILE, 'w', encoding='utf-8') as f:
-                json.dump(slides, f, indent=2, ensure_ascii=False)
+            updated = await catalog.update(slide['id'], language=language)
         except Exception as e:
             logger.error(f"Error saving slides to file: {e}")
             await query.edit_message_text(f"Verilənlər bazasını yadda saxlayarkən xəta: {str(e)}")
             return ConversationHandler.END
 
+        if not updated:
+            await query.edit_message_text("Xəta: Slayd verilənlər bazasında tapılmadı.")
+            return ConversationHandler.END
+
+        # Save the updated slide back to context
+        context.user_data['selected_slide'] = updated
+
         # Update user's slides list in context
         user_slides = context.user_data.get('user_slides', [])
         for i, s in enumerate(user_slides):
@@ -1631,31 +2124,21 @@ async def handle_edit_category(update: Update, context: ContextTypes.DEFAULT_TYP
         # First, update the UI to show processing
         await query.edit_message_text(f"Kateqoriya '{category}' olaraq yenilənir... Xahiş edirik gözləyin.")
         
-        # Load slides directly from file to ensure we have latest data
-        slides = load_slides()
-        
-        # Find and update the specific slide
-        updated = False
-        for i, s in enumerate(slides):
-            if s['id'] == slide['id']:
-                slides[i]['category'] = category
-                context.user_data['selected_slide'] = slides[i]  # Update in context
-                updated = True
-                logger.debug(f"Updated slide ID: {slide['id']} with new category: {category}")
-                break
-        
-        if not updated:
-            await query.edit_message_text("Xəta: Slayd verilənlər bazasında tapılmadı.")
-            return ConversationHandler.END
-
-        # Save updated slides with explicit error handling
+        # Find and update the specific slide with explicit error handling
         try:
-            save_slides(slides)
+            updated = await catalog.update(slide['id'], category=category)
         except Exception as e:
             logger.error(f"Error saving slides to file: {e}")
             await query.edit_message_text(f"Verilənlər bazasını yadda saxlayarkən xəta: {str(e)}")
             return ConversationHandler.END
 
+        if not updated:
+            await query.edit_message_text("Xəta: Slayd verilənlər bazasında tapılmadı.")
+            return ConversationHandler.END
+
+        context.user_data['selected_slide'] = updated  # Update in context
+        logger.debug(f"Updated slide ID: {slide['id']} with new category: {category}")
+
         # Update user's slides list in context
         user_slides = context.user_data.get('user_slides', [])
         for i, s in enumerate(user_slides):
@@ -1772,39 +2255,29 @@ async def handle_edit_value(update: Update, context: ContextTypes.DEFAULT_TYPE):
         elif not value:
             raise ValueError("Dəyər boş ola bilməz.")
 
-        # Load all slides
-        slides = load_slides()
+        # Map field names to database fields
+        field_mapping = {
+            "ad": "name",
+            "kateqoriya": "category",
+            "qiymət": "price",
+            "dil": "language",
+            "səhifə sayı": "pages",
+            "kart": "card"
+        }
         
-        # Find and update the specific slide
-        for i, s in enumerate(slides):
-            if s['id'] == slide['id']:
-                # Map field names to database fields
-                field_mapping = {
-                    "ad": "name",
-                    "kateqoriya": "category",
-                    "qiymət": "price",
-                    "dil": "language",
-                    "səhifə sayı": "pages",
-                    "kart": "card"
-                }
-                
-                # Get the correct database field name
-                db_field = field_mapping.get(field, field)
-                
-                # Update the field
-                slides[i][db_field] = value
-                
-                # Save the updated slides
-                with open(DB_FILE, 'w', encoding='utf-8') as f:
-                    json.dump(slides, f, indent=2, ensure_ascii=False)
-                
-                # Update the slide in context
-                context.user_data['selected_slide'] = slides[i]
-                
-                await update.message.reply_text(f"✅ {field.capitalize()} '{value}' olaraq yeniləndi.")
-                return await my_slides(update, context)
-                
-        raise ValueError("Slayd tapılmadı.")
+        # Get the correct database field name
+        db_field = field_mapping.get(field, field)
+        
+        # Update the field
+        updated = await catalog.update(slide['id'], **{db_field: value})
+        if not updated:
+            raise ValueError("Slayd tapılmadı.")
+        
+        # Update the slide in context
+        context.user_data['selected_slide'] = updated
+        
+        await update.message.reply_text(f"✅ {field.capitalize()} '{value}' olaraq yeniləndi.")
+        return await my_slides(update, context)
 
     except ValueError as e:
         await update.message.reply_text(f"Xəta: {str(e)}")
@@ -1818,8 +2291,7 @@ async def my_slides(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.message.from_user
     logger.info(f"User {user.id} ({user.full_name}) requested their slides")
 
-    slides = load_slides()
-    user_slides = [slide for slide in slides if slide['owner'] == user.id]
+    user_slides = catalog.by_owner(user.id)
 
     if not user_slides:
         await update.message.reply_text("Siz hələ heç bir təqdimat paylaşmamısınız.")
@@ -1866,17 +2338,12 @@ async def handle_slide_selection(update: Update, context: ContextTypes.DEFAULT_T
                 f"Satış sayı: {slide.get('sales', 0)}"
             )
             
-            # Show images if available
-            if slide.get('images'):
-                for image_path in slide['images']:
-                    if os.path.exists(image_path):
-                        try:
-                            await context.bot.send_photo(
-                                chat_id=query.message.chat_id,
-                                photo=open(image_path, 'rb')
-                            )
-                        except Exception as e:
-                            logger.error(f"Error sending image {image_path}: {e}")
+            # Şəkillər varsa, məlumat albomun başlığında göndərilir
+            sent = []
+            try:
+                sent = await send_preview_group(context.bot, query.message.chat_id, slide, slide_info, rendition='medium')
+            except Exception as e:
+                logger.error(f"Error sending preview images: {e}")
             
             # Create action buttons
             keyboard = [
@@ -1886,7 +2353,7 @@ async def handle_slide_selection(update: Update, context: ContextTypes.DEFAULT_T
             ]
             
             await query.message.reply_text(
-                slide_info,
+                "Nə etmək istəyirsiniz?" if sent else slide_info,
                 reply_markup=InlineKeyboardMarkup(keyboard)
             )
             return SELECT_SLIDE_ACTION
@@ -1901,19 +2368,137 @@ async def handle_slide_selection(update: Update, context: ContextTypes.DEFAULT_T
         return ConversationHandler.END
 
 
+# -- Background Jobs --
+async def compact_storage(context: ContextTypes.DEFAULT_TYPE):
+    # Jurnalı snapshot-a birləşdir; yazıçı tapşırığı bunu yazılar arasında, event loop-dan kənarda edir
+    try:
+        await writer.compact()
+    except Exception as e:
+        logger.error(f"Error compacting slide journal: {e}")
+
+async def sweep_uploads(context: ContextTypes.DEFAULT_TYPE):
+    # Vaxtı keçmiş yükləmələri və heç bir qeydə bağlı olmayan faylları sil
+    expired = pending_uploads.expired(PENDING_UPLOAD_TTL)
+    paths = []
+    for upload in expired:
+        await pending_uploads.remove(upload['user_id'], upload['slide_id'])
+        filestore.release(upload['file'], delete=False)
+        paths.extend(upload_files(upload))
+
+    # Yarımçıq qalmış yükləmə söhbətlərinin istinadları
+    now = time.time()
+    for user_id, (path, acquired) in list(draft_files.items()):
+        if now - acquired > PENDING_UPLOAD_TTL:
+            release_draft_file(user_id, delete=False)
+
+    referenced = [path for path, _ in draft_files.values()]
+    for record in catalog.all() + pending_uploads.all():
+        referenced.extend(upload_files(record))
+        if record.get('file'):
+            referenced.append(text_cache_path(record['file'], CONTENT_DIR))
+
+    try:
+        files, reclaimed = await asyncio.to_thread(
+            reclaim_files, paths, ["downloads", "images", CONTENT_DIR], referenced, PENDING_UPLOAD_TTL
+        )
+    except Exception as e:
+        logger.error(f"Error sweeping upload files: {e}")
+        return
+
+    for upload in expired:
+        try:
+            await context.bot.send_message(
+                chat_id=upload['user_id'],
+                text=f"⌛ Slaydınız ('{upload['name']}') vaxtında təsdiqlənmədiyi üçün silindi.\n"
+                     "Zəhmət olmasa yenidən yükləyin və ya @UniSlayd ilə əlaqə saxlayın."
+            )
+        except TelegramError as e:
+            logger.error(f"Failed to notify user {upload['user_id']} about expired upload: {e}")
+
+    if expired or files:
+        logger.info(f"Upload sweep: expired {len(expired)} pending uploads, "
+                    f"deleted {files} files, reclaimed {reclaimed / (1024 * 1024):.2f} MB")
+        await context.bot.send_message(
+            chat_id=ADMIN_CHAT_ID,
+            text=f"🧹 Təmizləmə: {len(expired)} köhnə yükləmə silindi, "
+                 f"{files} fayl ({reclaimed / (1024 * 1024):.2f} MB) boşaldıldı."
+        )
+
+async def flush_search_log(context: ContextTypes.DEFAULT_TYPE):
+    try:
+        await asyncio.to_thread(search_log.write, search_log.take_unflushed())
+    except Exception as e:
+        logger.error(f"Error writing search log: {e}")
+
+async def index_slide_content(slide):
+    global content_pool
+    loop = asyncio.get_running_loop()
+    pool = content_pool
+    try:
+        counts = await loop.run_in_executor(pool, extract_tokens, slide['file'], CONTENT_DIR)
+    except BrokenProcessPool:
+        # İşçi proses öldürülüb (məs. yaddaş bitib); hovuz bir dəfə yenidən yaradılır
+        if pool is content_pool:
+            logger.error(f"Content worker died while extracting slide {slide['id']}, restarting the pool")
+            content_pool = ProcessPoolExecutor(max_workers=CONTENT_WORKERS)
+            pool.shutdown(wait=False, cancel_futures=True)
+        return
+    except Exception as e:
+        logger.error(f"Error extracting text from slide {slide['id']}: {e}")
+        return
+    # Çıxarış zamanı slayd silinmiş ola bilər
+    if counts and catalog.get(slide['id']):
+        content_index.add(slide['id'], counts)
+
+async def index_catalog_content(context: ContextTypes.DEFAULT_TYPE):
+    # Keşdə olan fayllar tez oxunur, qalanları işçi proseslərdə paralel çıxarılır;
+    # bir dəstədə işçi sayının iki qatı qədər fayl növbəyə qoyulur
+    slides = [s for s in catalog.all() if s.get('file')]
+    batch = CONTENT_WORKERS * 2
+    for i in range(0, len(slides), batch):
+        await asyncio.gather(*(index_slide_content(slide) for slide in slides[i:i + batch]))
+    logger.info(f"Indexed content of {len(content_index)} slides")
+
+async def startup(app: Application):
+    writer.start()
+
+async def shutdown(app: Application):
+    content_pool.shutdown(wait=False, cancel_futures=True)
+    image_service.shutdown()
+    search_log.write(search_log.take_unflushed())
+    await writer.stop()
+    storage.close()
+
 # -- Main App 
 def main():
-    app = Application.builder().token(TOKEN).build()
+    # Bir istifadəçinin yavaş yeniləməsi (şəkil emalı, fayl yükləmə) başqalarını gözlətmir
+    app = (
+        Application.builder().token(TOKEN)
+        .concurrent_updates(PerUserUpdateProcessor(CONCURRENT_UPDATES))
+        .post_init(startup).post_shutdown(shutdown)
+        .build()
+    )
+
+    storage.open()
+    catalog.load()
+    ledger.load()
+    pending_uploads.load()
+    search_log.load()
+    thumbnail_cache.load()
+    image_hashes.rebuild(ledger.all(), catalog.all() + pending_uploads.all())
+    filestore.rebuild(catalog.all() + pending_uploads.all())
+    if STORAGE_BACKEND == 'sqlite' and not len(catalog) and os.path.exists(DB_FILE):
+        logger.warning(f"SQLite database is empty but {DB_FILE} exists. Run `python storage.py migrate` to import it.")
 
     os.makedirs("downloads", exist_ok=True)
     os.makedirs("images", exist_ok=True)
     os.makedirs("payments", exist_ok=True)
 
-    if not os.path.exists("pending_uploads.json"):
-        with open("pending_uploads.json", 'w', encoding='utf-8') as f:
-            json.dump([], f, indent=2, ensure_ascii=False)
-
     app.add_error_handler(error_handler)
+    app.job_queue.run_repeating(compact_storage, interval=JOURNAL_COMPACT_INTERVAL, first=JOURNAL_COMPACT_INTERVAL)
+    app.job_queue.run_repeating(sweep_uploads, interval=UPLOAD_SWEEP_INTERVAL, first=60)
+    app.job_queue.run_once(index_catalog_content, when=5)
+    app.job_queue.run_repeating(flush_search_log, interval=60, first=60)
 
     conv_handler = ConversationHandler(
         entry_points=[
@@ -1930,12 +2515,10 @@ def main():
             ],
             UPLOAD_PRICE: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_price)],
             UPLOAD_LANGUAGE: [CallbackQueryHandler(handle_language, pattern=r'^(lang_|back_to_price)')],
-            UPLOAD_PAGES: [
-                MessageHandler(filters.TEXT & ~filters.COMMAND, handle_pages),
-                CallbackQueryHandler(handle_pages, pattern=r'^back_to_language$')
-            ],
+            UPLOAD_PAGES: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_pages)],
             UPLOAD_CARD: [
                 MessageHandler(filters.TEXT & ~filters.COMMAND, handle_card),
+                CallbackQueryHandler(ask_pages, pattern=r'^back_to_pages$'),
                 CallbackQueryHandler(handle_card)
             ],
             UPLOAD_IMAGE: [
@@ -1944,7 +2527,8 @@ def main():
                 CallbackQueryHandler(handle_card, pattern=r'^back_to_card$')
             ],
             SEARCH_TYPE: [
-                CallbackQueryHandler(handle_search_type, pattern="^(search_by_name|search_by_category|search_by_language)$"),
+                CallbackQueryHandler(handle_search_type, pattern="^(search_by_name|search_by_category|search_by_language|search_by_filter|search_by_content|search_top|search_new)$"),
+                CallbackQueryHandler(handle_suggestion, pattern=r'^suggest_\d+$'),
                 MessageHandler(filters.TEXT & ~filters.COMMAND, handle_search_by_name)
             ],
             SEARCH_LANGUAGE: [
@@ -1953,8 +2537,17 @@ def main():
             ],
             SEARCH_CATEGORY: [CallbackQueryHandler(handle_search_category, pattern=r'^search_category_')],
             SEARCH_OTHER_CATEGORY: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_search_other_category)],
+            SEARCH_CONTENT: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_search_by_content)],
+            SEARCH_FILTER: [
+                CallbackQueryHandler(handle_filter_facet, pattern=r'^facet_(category|language|file_type|price)$'),
+                CallbackQueryHandler(handle_filter_value, pattern=r'^(filter_(category|language|file_type|price)_(\d+|any)|filter_menu|filter_reset)$'),
+                CallbackQueryHandler(handle_filter_show, pattern="^filter_show$"),
+                CallbackQueryHandler(start, pattern="^main_menu$")
+            ],
             SELECT_SLIDE: [
                 CallbackQueryHandler(view_selected_slide, pattern=r'^slide_\d+$'),
+                CallbackQueryHandler(handle_results_page, pattern=r'^page_\d+$'),
+                CallbackQueryHandler(handle_results_sort, pattern=r'^sort_(popular|newest|cheapest)$'),
                 CallbackQueryHandler(start, pattern="^main_menu$")
             ],
             CONFIRM_PAYMENT: [
@@ -1986,8 +2579,10 @@ def main():
 
     app.add_handler(conv_handler)
     app.add_handler(CommandHandler("help", help_command))
-    app.add_handler(CallbackQueryHandler(approve_payment, pattern=r'^approve_payment_\d+$'))
-    app.add_handler(CallbackQueryHandler(reject_payment, pattern=r'^reject_payment_\d+$'))
+    app.add_handler(CommandHandler("stats", stats_command))
+    app.add_handler(InlineQueryHandler(inline_search))
+    app.add_handler(CallbackQueryHandler(approve_payment, pattern=r'^approve_payment_[0-9a-f]+$'))
+    app.add_handler(CallbackQueryHandler(reject_payment, pattern=r'^reject_payment_[0-9a-f]+$'))
     app.add_handler(CallbackQueryHandler(approve_upload, pattern=r'^approve_upload_\d+_[0-9a-f-]+$'))
     app.add_handler(CallbackQueryHandler(reject_upload, pattern=r'^reject_upload_\d+_[0-9a-f-]+$'))
 
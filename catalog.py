@@ -0,0 +1,106 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SlideCatalog:
+    """Process-wide in-memory slide catalog.
+
+    The storage backend is read once by load(); every read after that is
+    served from memory. Mutations update memory immediately and are then
+    persisted through the PersistenceWriter; they return once durable.
+
+    Listeners (search indexes and the like) expose add(slide) and
+    discard(slide_id) and are notified of every change. `version` is bumped
+    on every change so caches derived from the catalog can tell when they
+    are stale. set_meta() is the exception, for bookkeeping fields that no
+    listener or cache depends on.
+    """
+
+    def __init__(self, storage, writer):
+        self.storage = storage
+        self.writer = writer
+        self._slides = {}
+        self._listeners = []
+        self.version = 0
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+        for slide in self._slides.values():
+            listener.add(slide)
+
+    def load(self):
+        self._slides = {}
+        for slide in self.storage.load_slides():
+            # Köhnə qeydlərdə satış sayı olmaya bilər
+            slide.setdefault('sales', 0)
+            self._slides[slide['id']] = slide
+            for listener in self._listeners:
+                listener.add(slide)
+        self.version += 1
+
+        logger.info(f"Loaded {len(self._slides)} slides")
+
+    def __len__(self):
+        return len(self._slides)
+
+    def all(self):
+        return list(self._slides.values())
+
+    def get(self, slide_id):
+        return self._slides.get(slide_id)
+
+    def find_by_file(self, file_path):
+        return next((s for s in self._slides.values() if s.get('file') == file_path), None)
+
+    def by_owner(self, owner_id):
+        return [s for s in self._slides.values() if s.get('owner') == owner_id]
+
+    async def add(self, slide):
+        slide.setdefault('sales', 0)
+        self._slides[slide['id']] = slide
+        self.version += 1
+        for listener in self._listeners:
+            listener.add(slide)
+        await self.writer.submit(self.storage.put_slide, slide)
+        return slide
+
+    async def update(self, slide_id, **fields):
+        slide = self._slides.get(slide_id)
+        if slide is None:
+            return None
+        slide.update(fields)
+        self.version += 1
+        for listener in self._listeners:
+            listener.discard(slide_id)
+            listener.add(slide)
+        await self.writer.submit(self.storage.update_slide, slide, fields)
+        return slide
+
+    async def set_meta(self, slide_id, **fields):
+        """Persist fields no listener or cache reads, such as cached Telegram file_ids.
+
+        Unlike update(), listeners are not re-indexed and `version` is left
+        alone, so result caches stay valid.
+        """
+        slide = self._slides.get(slide_id)
+        if slide is None:
+            return None
+        slide.update(fields)
+        await self.writer.submit(self.storage.update_slide, slide, fields)
+        return slide
+
+    async def increment_sales(self, slide_id):
+        slide = self._slides.get(slide_id)
+        if slide is None:
+            return None
+        return await self.update(slide_id, sales=slide.get('sales', 0) + 1)
+
+    async def remove(self, slide_id):
+        slide = self._slides.pop(slide_id, None)
+        if slide is not None:
+            self.version += 1
+            for listener in self._listeners:
+                listener.discard(slide_id)
+            await self.writer.submit(self.storage.delete_slide, slide_id)
+        return slide
@@ -12,12 +12,41 @@ TOKEN = os.getenv('BOT_TOKEN')
 ADMIN_CHAT_ID = os.getenv('ADMIN_CHAT_ID')
 BOT_USERNAME = os.getenv('BOT_USERNAME')
 
+# Storage configuration: 'json' (default) or 'sqlite'
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'json').lower()
+DB_FILE = "db.json"
+PAYMENTS_FILE = "payments.json"
+PENDING_UPLOADS_FILE = "pending_uploads.json"
+# How often (seconds) the slide journal is folded back into db.json
+JOURNAL_COMPACT_INTERVAL = int(os.getenv('JOURNAL_COMPACT_INTERVAL', '600'))
+# Pending uploads (and unreferenced upload files) older than this are deleted
+PENDING_UPLOAD_TTL = int(os.getenv('PENDING_UPLOAD_TTL_HOURS', '72')) * 3600
+UPLOAD_SWEEP_INTERVAL = int(os.getenv('UPLOAD_SWEEP_INTERVAL', '3600'))
+
 # Directory configurations
 DB_DIR = os.path.join(BASE_DIR, 'db')
 DOWNLOADS_DIR = os.path.join(BASE_DIR, 'downloads')
 IMAGES_DIR = os.path.join(BASE_DIR, 'images')
+SQLITE_FILE = os.getenv('SQLITE_FILE', os.path.join(DB_DIR, 'unislayd.sqlite3'))
+# Text extracted from slide files for content search, cached per file
+CONTENT_DIR = os.path.join(DB_DIR, 'content')
+CONTENT_WORKERS = int(os.getenv('CONTENT_WORKERS', '2'))
+# Image processing worker processes and how many photos may be processed at once
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', '2'))
+IMAGE_MAX_PENDING = int(os.getenv('IMAGE_MAX_PENDING', '8'))
+# How many updates may be handled at once; updates of the same user still run one at a time
+CONCURRENT_UPDATES = int(os.getenv('CONCURRENT_UPDATES', '64'))
+# Append-only log of searches (query, result count, latency) for /stats
+SEARCH_LOG_FILE = os.path.join(DB_DIR, 'search_log.jsonl')
+# Small/medium preview renditions, evicted least-recently-used past this many MB
+THUMBNAILS_DIR = os.path.join(BASE_DIR, 'thumbnails')
+THUMBNAIL_CACHE_MB = int(os.getenv('THUMBNAIL_CACHE_MB', '200'))
+# Max bit distance at which a receipt (8192-bit text hash) or preview (64-bit dhash)
+# counts as a reused image
+RECEIPT_HASH_DISTANCE = int(os.getenv('RECEIPT_HASH_DISTANCE', '7'))
+PREVIEW_HASH_DISTANCE = int(os.getenv('PREVIEW_HASH_DISTANCE', '6'))
 
 # Create directories if they don't exist
-for directory in [DB_DIR, DOWNLOADS_DIR, IMAGES_DIR]:
+for directory in [DB_DIR, DOWNLOADS_DIR, IMAGES_DIR, CONTENT_DIR, THUMBNAILS_DIR]:
     if not os.path.exists(directory):
         os.makedirs(directory)
\ No newline at end of file
@@ -0,0 +1,124 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+def format_hash(value):
+    return f"{value:016x}"
+
+
+def parse_hash(text):
+    return int(text, 16)
+
+
+class BKTree:
+    """Burkhard-Keller tree over integer hashes with Hamming distance.
+
+    Each child edge is labelled with its distance to the parent, so a
+    lookup within `radius` only descends into edges in
+    [d - radius, d + radius] instead of scanning every hash.
+    """
+
+    def __init__(self):
+        # Düyün: [heş, dəyərlər, {məsafə: uşaq düyün}]
+        self._root = None
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def add(self, key, value):
+        self._size += 1
+        if self._root is None:
+            self._root = [key, [value], {}]
+            return
+        node = self._root
+        while True:
+            distance = hamming(key, node[0])
+            if distance == 0:
+                node[1].append(value)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [key, [value], {}]
+                return
+            node = child
+
+    def search(self, key, radius):
+        """[(distance, value)] for every stored hash within `radius` bits, closest first."""
+        if self._root is None:
+            return []
+        results = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            distance = hamming(key, node[0])
+            if distance <= radius:
+                results.extend((distance, value) for value in node[1])
+            for edge, child in node[2].items():
+                if distance - radius <= edge <= distance + radius:
+                    stack.append(child)
+        results.sort(key=lambda item: item[0])
+        return results
+
+
+class ImageHashIndex:
+    """Perceptual hashes of payment receipts and slide previews.
+
+    Receipts map to payment ids, previews to slide ids (a pending upload
+    keeps its slide id once approved). Receipts are also indexed exactly, by
+    Telegram's file_unique_id and the SHA-256 of the downloaded photo.
+    Entries are never removed; callers skip matches whose payment or slide
+    no longer exists.
+    """
+
+    def __init__(self):
+        self.receipts = BKTree()
+        self.previews = BKTree()
+        self._exact = {}
+
+    def rebuild(self, payments, slides):
+        self.receipts = BKTree()
+        self.previews = BKTree()
+        self._exact = {}
+        for payment in payments:
+            self.add_receipt(payment)
+        for slide in slides:
+            self.add_previews(slide.get('id') or slide['slide_id'], slide.get('image_hashes', {}))
+        logger.info(f"Indexed {len(self.receipts)} receipt and {len(self.previews)} preview hashes")
+
+    def add_receipt(self, payment):
+        for key in ('receipt_unique_id', 'receipt_sha256'):
+            if payment.get(key):
+                self._exact.setdefault(payment[key], []).append(payment['id'])
+        if payment.get('receipt_hash'):
+            self.receipts.add(parse_hash(payment['receipt_hash']), payment['id'])
+
+    def add_previews(self, slide_id, hashes):
+        for value in set(hashes.values()):
+            self.previews.add(parse_hash(value), slide_id)
+
+    def same_receipts(self, payment):
+        """Ids of earlier payments that sent exactly this photo."""
+        ids = []
+        for key in ('receipt_unique_id', 'receipt_sha256'):
+            for payment_id in self._exact.get(payment.get(key), []):
+                if payment_id not in ids:
+                    ids.append(payment_id)
+        return ids
+
+    def similar_receipts(self, value, radius):
+        return self.receipts.search(parse_hash(value), radius)
+
+    def similar_previews(self, hashes, radius, exclude=None):
+        """Closest match per slide id for any of `hashes`, skipping `exclude`."""
+        best = {}
+        for value in set(hashes.values()):
+            for distance, slide_id in self.previews.search(parse_hash(value), radius):
+                if slide_id != exclude and distance < best.get(slide_id, radius + 1):
+                    best[slide_id] = distance
+        return sorted(((d, slide_id) for slide_id, d in best.items()), key=lambda item: item[0])
@@ -0,0 +1,369 @@
+import os
+import re
+import zlib
+import logging
+import zipfile
+import xml.etree.ElementTree as ET
+from collections import Counter
+
+from search import tokenize
+
+logger = logging.getLogger(__name__)
+
+# Bir fayldan çıxarılan mətnin yuxarı həddi (simvol)
+MAX_TEXT_LENGTH = 200_000
+# Bir fayl üçün açılan (decompress) məlumatın cəmi, bir slayd XML-i və bir PDF axını üçün yuxarı hədd (bayt)
+MAX_INFLATED_BYTES = 256 * 1024 * 1024
+_SLIDE_XML_LIMIT = 8 * 1024 * 1024
+_PDF_STREAM_LIMIT = 16 * 1024 * 1024
+
+_DRAWINGML_NS = "{http://schemas.openxmlformats.org/drawingml/2006/main}"
+_SLIDE_RE = re.compile(r"^ppt/slides/slide(\d+)\.xml$")
+
+_STREAM_RE = re.compile(rb"stream\r?\n(.*?)\r?\nendstream", re.S)
+_TEXT_BLOCK_RE = re.compile(rb"BT(.*?)ET", re.S)
+# (mətn) Tj, [(mə) -20 (tn)] TJ, (mətn) ' və (mətn) " operatorları
+_TEXT_OP_RE = re.compile(rb"(\[(?:[^\]\\]|\\.)*\]\s*TJ|\((?:[^)\\]|\\.)*\)\s*(?:Tj|'|\")|<[0-9A-Fa-f\s]*>\s*Tj)", re.S)
+_STRING_RE = re.compile(rb"\(((?:[^)\\]|\\.)*)\)|<([0-9A-Fa-f\s]*)>", re.S)
+_ESCAPES = {b'n': b'\n', b'r': b'\r', b't': b'\t', b'b': b'\b', b'f': b'\f'}
+
+
+def _read_member(archive, name, limit):
+    """Bytes of a zip member, or None if it is larger than `limit` once inflated.
+
+    The declared size is checked first and the read itself is capped too,
+    since the central directory of an uploaded file can lie.
+    """
+    info = archive.getinfo(name)
+    if info.file_size <= limit:
+        with archive.open(info) as f:
+            data = f.read(limit + 1)
+        if len(data) <= limit:
+            return data
+    logger.warning(f"Skipping oversized {name} ({info.file_size} bytes declared)")
+    return None
+
+
+def extract_pptx(path):
+    """Text of every slide in a PPTX deck, one line per slide, in slide order.
+
+    Slides over _SLIDE_XML_LIMIT are skipped and reading stops once
+    MAX_INFLATED_BYTES have been inflated, so a zip bomb cannot exhaust
+    the worker's memory.
+    """
+    with zipfile.ZipFile(path) as archive:
+        slides = []
+        for name in archive.namelist():
+            match = _SLIDE_RE.match(name)
+            if match:
+                slides.append((int(match.group(1)), name))
+
+        lines = []
+        budget = MAX_INFLATED_BYTES
+        length = 0
+        for _, name in sorted(slides):
+            if budget <= 0:
+                logger.warning(f"Stopped inflating {path} after {MAX_INFLATED_BYTES} bytes")
+                break
+            data = _read_member(archive, name, min(_SLIDE_XML_LIMIT, budget))
+            if data is None:
+                continue
+            budget -= len(data)
+            texts = [el.text for el in ET.fromstring(data).iter(f"{_DRAWINGML_NS}t") if el.text]
+            lines.append(" ".join(texts))
+            length += len(lines[-1])
+            if length >= MAX_TEXT_LENGTH:
+                break
+    return "\n".join(lines)
+
+
+def _unescape(raw):
+    out = bytearray()
+    i = 0
+    while i < len(raw):
+        c = raw[i:i + 1]
+        if c != b'\\':
+            out += c
+            i += 1
+            continue
+        nxt = raw[i + 1:i + 2]
+        if nxt in _ESCAPES:
+            out += _ESCAPES[nxt]
+            i += 2
+        elif nxt and nxt in b"01234567":
+            octal = re.match(rb"[0-7]{1,3}", raw[i + 1:i + 4]).group(0)
+            out.append(int(octal, 8) & 0xFF)
+            i += 1 + len(octal)
+        elif nxt in (b'\r', b'\n'):
+            i += 2
+        else:
+            out += nxt
+            i += 2
+    return bytes(out)
+
+
+def _decode(data):
+    if data.startswith(b'\xfe\xff'):
+        return data[2:].decode('utf-16-be', errors='ignore')
+    return data.decode('latin-1')
+
+
+def _stream_text(content):
+    parts = []
+    for block in _TEXT_BLOCK_RE.findall(content):
+        for op in _TEXT_OP_RE.findall(block):
+            pieces = []
+            for literal, hexa in _STRING_RE.findall(op):
+                if hexa:
+                    digits = re.sub(rb"\s", b"", hexa)
+                    if len(digits) % 2:
+                        digits += b"0"
+                    pieces.append(_decode(bytes.fromhex(digits.decode())))
+                else:
+                    pieces.append(_decode(_unescape(literal)))
+            parts.append("".join(pieces))
+        parts.append("\n")
+    return " ".join(parts)
+
+
+def extract_pdf(path):
+    """Best-effort text of a PDF from its (Flate-compressed) content streams.
+
+    Only text drawn with standard string operators is recovered; fonts with
+    custom CID encodings yield nothing useful and are skipped. Each stream
+    is inflated to at most _PDF_STREAM_LIMIT bytes and the whole file to
+    MAX_INFLATED_BYTES.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    parts = []
+    length = 0
+    budget = MAX_INFLATED_BYTES
+    for raw in _STREAM_RE.findall(data):
+        if budget <= 0:
+            logger.warning(f"Stopped inflating {path} after {MAX_INFLATED_BYTES} bytes")
+            break
+        try:
+            # Şəkil axınları da açılır, ona görə hər axın ayrıca məhdudlaşdırılır
+            content = zlib.decompressobj().decompress(raw, min(_PDF_STREAM_LIMIT, budget))
+        except zlib.error:
+            content = raw
+        budget -= len(content)
+        if b"BT" not in content:
+            continue
+        text = _stream_text(content)
+        parts.append(text)
+        length += len(text)
+        if length >= MAX_TEXT_LENGTH:
+            break
+    return "".join(parts)
+
+
+def extract_text(path):
+    """Plain text of a slide file; empty for unsupported or unreadable files."""
+    extension = os.path.splitext(path)[1].lower()
+    try:
+        if extension == '.pptx':
+            text = extract_pptx(path)
+        elif extension == '.pdf':
+            text = extract_pdf(path)
+        else:
+            return ""
+    except (OSError, zipfile.BadZipFile, ET.ParseError, ValueError) as e:
+        logger.error(f"Error extracting text from {path}: {e}")
+        return ""
+    # Nəzarət simvollarını və artıq boşluqları təmizlə
+    text = re.sub(r"[^\S\n]+", " ", re.sub(r"[\x00-\x08\x0b-\x1f]", " ", text))
+    return text.strip()[:MAX_TEXT_LENGTH]
+
+
+def text_cache_path(path, cache_dir):
+    return os.path.join(cache_dir, os.path.basename(path) + ".txt")
+
+
+def extract_cached(path, cache_dir):
+    """extract_text() with the result cached as <cache_dir>/<file name>.txt.
+
+    Slide files are named after their content hash, so the cache entry never
+    goes stale. Blocking; meant to run in a worker process.
+    """
+    cache_path = text_cache_path(path, cache_dir)
+    try:
+        with open(cache_path, encoding='utf-8') as f:
+            return f.read()
+    except FileNotFoundError:
+        pass
+
+    if not os.path.exists(path):
+        return ""
+    text = extract_text(path)
+    tmp_path = cache_path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, cache_path)
+    return text
+
+
+def extract_tokens(path, cache_dir):
+    """{token: occurrences} of extract_cached() text, for ContentIndex.add().
+
+    Tokenizing up to MAX_TEXT_LENGTH characters takes tens of milliseconds,
+    so it happens here in the worker rather than on the event loop.
+    """
+    return Counter(tokenize(extract_cached(path, cache_dir)))
+
+
+def read_cached(paths, cache_dir):
+    """{path: cached text} for the given slide files; files without a cache entry are skipped.
+
+    Blocking; meant to run in a worker thread.
+    """
+    texts = {}
+    for path in paths:
+        try:
+            with open(text_cache_path(path, cache_dir), encoding='utf-8') as f:
+                texts[path] = f.read()
+        except FileNotFoundError:
+            continue
+    return texts
+
+
+def remove_cached(path, cache_dir):
+    try:
+        os.remove(text_cache_path(path, cache_dir))
+    except FileNotFoundError:
+        pass
+
+
+_APP_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/extended-properties}"
+_PDF_TAIL_SIZE = 4096
+_PDF_CHUNK_SIZE = 1024 * 1024
+# Yoxlanılmamış yükləmədən oxunan metadata üzvlərinin yuxarı həddi (bayt)
+_APP_XML_LIMIT = 64 * 1024
+_THUMBNAIL_LIMIT = 2 * 1024 * 1024
+
+
+def pptx_metadata(path):
+    """Slide count from docProps/app.xml and the embedded thumbnail JPEG.
+
+    Only the zip central directory and these two members are read, each
+    only if it is small; the slides themselves are never decompressed.
+    """
+    pages = None
+    thumbnail = None
+    with zipfile.ZipFile(path) as archive:
+        names = set(archive.namelist())
+        if 'docProps/app.xml' in names:
+            data = _read_member(archive, 'docProps/app.xml', _APP_XML_LIMIT)
+            slides = ET.fromstring(data).find(f"{_APP_NS}Slides") if data else None
+            if slides is not None and slides.text and slides.text.strip().isdigit():
+                pages = int(slides.text) or None
+        if 'docProps/thumbnail.jpeg' in names:
+            thumbnail = _read_member(archive, 'docProps/thumbnail.jpeg', _THUMBNAIL_LIMIT)
+    return pages, thumbnail
+
+
+def _pdf_object_offset(f, xref_offset, number, depth=0):
+    # Klassik xref cədvəlində hər qeyd 20 baytdır, ona görə lazım olan sətrə birbaşa keçmək olur
+    f.seek(xref_offset)
+    if f.read(4) != b"xref":
+        return None
+    f.readline()
+    while True:
+        header = f.readline().split()
+        if len(header) != 2 or not header[0].isdigit():
+            break
+        start, count = int(header[0]), int(header[1])
+        table = f.tell()
+        if start <= number < start + count:
+            f.seek(table + (number - start) * 20)
+            entry = f.read(20).split()
+            if len(entry) >= 3 and entry[2] == b"n":
+                return int(entry[0])
+            return None
+        f.seek(table + count * 20)
+
+    prev = re.search(rb"/Prev\s+(\d+)", f.read(1024))
+    if prev and depth < 16:
+        return _pdf_object_offset(f, int(prev.group(1)), number, depth + 1)
+    return None
+
+
+def _pdf_reference(f, offset, key):
+    f.seek(offset)
+    match = re.search(rb"/" + key + rb"\s+(\d+)\s+\d+\s+R", f.read(2048))
+    return int(match.group(1)) if match else None
+
+
+def _pdf_count_from_xref(f, size):
+    f.seek(max(0, size - _PDF_TAIL_SIZE))
+    tail = f.read()
+    startxref = re.findall(rb"startxref\s+(\d+)", tail)
+    roots = re.findall(rb"/Root\s+(\d+)\s+\d+\s+R", tail)
+    if not startxref or not roots:
+        return None
+    xref = int(startxref[-1])
+
+    root_offset = _pdf_object_offset(f, xref, int(roots[-1]))
+    if root_offset is None:
+        return None
+    pages = _pdf_reference(f, root_offset, b"Pages")
+    pages_offset = _pdf_object_offset(f, xref, pages) if pages is not None else None
+    if pages_offset is None:
+        return None
+    f.seek(pages_offset)
+    match = re.search(rb"/Count\s+(\d+)", f.read(2048))
+    return int(match.group(1)) if match else None
+
+
+def _pdf_count_by_scan(f):
+    # xref axını olan faylar üçün: /Type /Pages obyektlərindəki ən böyük /Count
+    best = None
+    overlap = b""
+    f.seek(0)
+    while True:
+        chunk = f.read(_PDF_CHUNK_SIZE)
+        if not chunk:
+            break
+        data = overlap + chunk
+        for match in re.finditer(rb"/Type\s*/Pages\b", data):
+            window = data[max(0, match.start() - 256):match.end() + 256]
+            count = re.search(rb"/Count\s+(\d+)", window)
+            if count:
+                best = max(best or 0, int(count.group(1)))
+        overlap = data[-512:]
+    return best
+
+
+def pdf_page_count(path):
+    """Page count of a PDF read from its trailer and xref table.
+
+    Falls back to a chunked scan for /Type /Pages dictionaries when the file
+    uses cross-reference streams. Returns None if neither works, e.g. when
+    the page tree sits inside compressed object streams.
+    """
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        try:
+            count = _pdf_count_from_xref(f, size)
+        except (ValueError, OSError):
+            count = None
+        return count or _pdf_count_by_scan(f)
+
+
+def file_metadata(path):
+    """(pages, thumbnail JPEG bytes) detected from a slide file; either may be None.
+
+    Blocking; meant to run in a worker thread.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    try:
+        if extension == '.pptx':
+            return pptx_metadata(path)
+        if extension == '.pdf':
+            return pdf_page_count(path), None
+    except (OSError, zipfile.BadZipFile, ET.ParseError, ValueError) as e:
+        logger.error(f"Error reading metadata of {path}: {e}")
+    return None, None
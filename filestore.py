@@ -0,0 +1,85 @@
+import os
+import hashlib
+import logging
+from collections import Counter
+from uuid import uuid4
+
+logger = logging.getLogger(__name__)
+
+
+class HashingWriter:
+    """File-like wrapper that hashes everything written through it."""
+
+    def __init__(self, f):
+        self.f = f
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self.sha256.update(data)
+        self.size += len(data)
+        return self.f.write(data)
+
+    def hexdigest(self):
+        return self.sha256.hexdigest()
+
+
+class FileStore:
+    """Content-addressed store for uploaded slide files.
+
+    Files are named after the SHA-256 of their content, so the same deck
+    uploaded several times is kept once. Reference counts track how many
+    slides and pending uploads point at each file; release() deletes the
+    file when the last reference goes away.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self._refs = Counter()
+
+    def rebuild(self, records):
+        self._refs = Counter(os.path.normpath(r['file']) for r in records if r.get('file'))
+        logger.info(f"Tracking {len(self._refs)} slide files")
+
+    async def download(self, tg_file, extension):
+        """Stream a Telegram file to disk while hashing it.
+
+        Returns (path, duplicate) where duplicate is True if identical
+        content was already stored.
+        """
+        tmp_path = os.path.join(self.root, f".{uuid4().hex}.part")
+        try:
+            with open(tmp_path, 'wb') as f:
+                writer = HashingWriter(f)
+                await tg_file.download_to_memory(writer)
+            path = os.path.join(self.root, f"{writer.hexdigest()}{extension}")
+            if os.path.exists(path):
+                os.remove(tmp_path)
+                return path, True
+            os.replace(tmp_path, path)
+            return path, False
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def refs(self, path):
+        return self._refs[os.path.normpath(path)]
+
+    def acquire(self, path):
+        self._refs[os.path.normpath(path)] += 1
+
+    def release(self, path, delete=True):
+        """Drop one reference; delete the file when none are left.
+
+        Returns True if the file was deleted.
+        """
+        key = os.path.normpath(path)
+        if self._refs[key] > 1:
+            self._refs[key] -= 1
+            return False
+        self._refs.pop(key, None)
+        if delete and os.path.exists(path):
+            os.remove(path)
+            return True
+        return False
@@ -0,0 +1,173 @@
+import io
+import asyncio
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image, ImageFilter
+
+logger = logging.getLogger(__name__)
+
+# Telegram şəkillər üçün 10MB limit qoyur
+MAX_PHOTO_BYTES = 10 * 1024 * 1024
+# Keyfiyyət bu həcmə sığana qədər endirilir (ikili axtarışla)
+PREVIEW_TARGET_BYTES = 512 * 1024
+RECEIPT_TARGET_BYTES = 256 * 1024
+
+
+def dhash(image, size=8):
+    """64-bit difference hash: whether each pixel of a (size+1)x(size) grayscale
+    copy is brighter than its right neighbour. Near-identical images differ in
+    only a few bits.
+    """
+    small = image.convert("L").resize((size + 1, size), Image.Resampling.LANCZOS)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(size):
+        for col in range(size):
+            offset = row * (size + 1) + col
+            value = (value << 1) | (pixels[offset] > pixels[offset + 1])
+    return value
+
+
+def text_hash(image, size=(64, 128), radius=2, margin=12):
+    """Bitmap of the dark strokes (text, digits) in a size[0] x size[1] grid, as an int.
+
+    A cell is set when it is clearly darker than its blurred neighbourhood,
+    so flat layout areas of a banking app contribute nothing and receipts
+    from the same app differ wherever their amount, date or card differ.
+    Re-encoded or rescaled copies of one screenshot stay within a few bits.
+    """
+    small = image.convert("L").resize(size, Image.Resampling.BOX)
+    blurred = small.filter(ImageFilter.BoxBlur(radius))
+    bits = "".join("1" if p + margin < b else "0" for p, b in zip(small.tobytes(), blurred.tobytes()))
+    return int(bits, 2)
+
+
+def load_resized(source, max_size):
+    """Open an image (path or file object) and downscale it to fit `max_size`.
+
+    For JPEGs, draft() lets libjpeg decode straight at 1/2, 1/4 or 1/8 scale,
+    never below the target size, so a 12MP phone photo is not fully decoded
+    just to become a 1280px preview. LANCZOS then does the final step.
+    """
+    image = Image.open(source)
+    image.draft("RGB", max_size)
+    image = image.convert("RGB")
+    image.thumbnail(max_size, Image.Resampling.LANCZOS)
+    return image
+
+
+def encode_jpeg(image, quality, target_bytes=None, min_quality=40, max_steps=5, **options):
+    """Encode `image` as JPEG at `quality`, lowering it to fit `target_bytes`.
+
+    If the first encoding is too large, the highest quality in
+    [min_quality, quality) that fits is found by binary search with at most
+    `max_steps` more encodings. If none fits, the smallest result is returned.
+    """
+    def encode(q):
+        output = io.BytesIO()
+        image.save(output, format="JPEG", quality=q, optimize=True, **options)
+        return output.getvalue()
+
+    data = encode(quality)
+    if not target_bytes or len(data) <= target_bytes:
+        return data
+
+    low, high = min_quality, quality - 1
+    best = None
+    smallest = data
+    for _ in range(max_steps):
+        if low > high:
+            break
+        mid = (low + high) // 2
+        candidate = encode(mid)
+        if len(candidate) <= target_bytes:
+            best = candidate
+            low = mid + 1
+        else:
+            smallest = min(smallest, candidate, key=len)
+            high = mid - 1
+    return best if best is not None else smallest
+
+
+def process_image(data, path, max_size, quality, target_bytes=None, min_quality=40, max_bytes=None,
+                  fingerprint=dhash):
+    """Decode an uploaded photo, downscale it and write it to `path` as JPEG.
+
+    Metadata (EXIF, ICC) is dropped. The encoder quality is lowered toward
+    `target_bytes` if needed; a result still above `max_bytes` is an error.
+    Runs in a worker process; returns the size of the written file in bytes
+    and `fingerprint` (dhash() by default) of the image.
+    """
+    image = load_resized(io.BytesIO(data), max_size)
+    output = encode_jpeg(image, quality, target_bytes, min_quality)
+    if max_bytes and len(output) > max_bytes:
+        raise ValueError(f"Image size still too large after compression: {len(output) / (1024 * 1024):.2f} MB")
+
+    with open(path, 'wb') as f:
+        f.write(output)
+    return len(output), fingerprint(image)
+
+
+def render_thumbnail(source, path, max_size, quality):
+    """Write a downscaled progressive JPEG copy of the image at `source` to `path`.
+
+    Runs in a worker process; returns the size of the written file in bytes.
+    """
+    image = load_resized(source, max_size)
+    output = encode_jpeg(image, quality, progressive=True)
+    with open(path, 'wb') as f:
+        f.write(output)
+    return len(output)
+
+
+class ImageService:
+    """Runs Pillow work in a bounded process pool, off the event loop.
+
+    At most `max_pending` images are submitted at once; further callers
+    wait on a semaphore instead of piling work into the pool, so a burst of
+    uploads slows down only the users sending photos.
+    """
+
+    def __init__(self, workers=2, max_pending=8):
+        self._pool = ProcessPoolExecutor(max_workers=workers)
+        self._slots = asyncio.Semaphore(max_pending)
+        self.in_flight = 0
+        self.waiting = 0
+        self.processed = 0
+
+    async def _run(self, func, *args):
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._pool, func, *args)
+            self.processed += 1
+            return result
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+
+    async def preview(self, data, path):
+        """Slide preview image: up to 1280px, quality 70 lowered to at least 40 to fit 512KB."""
+        return await self._run(process_image, bytes(data), path, (1280, 1280), 70,
+                               PREVIEW_TARGET_BYTES, 40, MAX_PHOTO_BYTES)
+
+    async def receipt(self, data, path):
+        """Payment receipt: up to 640px, quality 70 lowered to at least 50 to fit 256KB.
+
+        The returned hash is text_hash(), not dhash(): a dhash of a banking
+        app screenshot only captures the app's layout.
+        """
+        return await self._run(process_image, bytes(data), path, (640, 640), 70,
+                               RECEIPT_TARGET_BYTES, 50, None, text_hash)
+
+    async def thumbnail(self, source, path, max_side, quality):
+        """Progressive JPEG rendition of a stored preview, at most `max_side` px."""
+        return await self._run(render_thumbnail, source, path, (max_side, max_side), quality)
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
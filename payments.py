@@ -0,0 +1,105 @@
+import time
+import logging
+from uuid import uuid4
+
+logger = logging.getLogger(__name__)
+
+PENDING = 'pending'
+APPROVED = 'approved'
+REJECTED = 'rejected'
+# Yalnız yaddaşda: admin təsdiqi icra olunarkən ikinci kliki bloklayır
+APPROVING = 'approving'
+
+
+class PaymentLedger:
+    """In-memory payment ledger with hash indexes by payment id, buyer and slide.
+
+    Every payment keeps a unique id and a status; approved and rejected
+    payments stay in the ledger as history. Writes go through the
+    PersistenceWriter like the slide catalog.
+    """
+
+    def __init__(self, storage, writer):
+        self.storage = storage
+        self.writer = writer
+        self._payments = {}
+        self._by_buyer = {}
+        self._by_slide = {}
+
+    def load(self):
+        self._payments = {}
+        self._by_buyer = {}
+        self._by_slide = {}
+        for payment in self.storage.load_payments():
+            if payment['status'] == APPROVING:
+                payment['status'] = PENDING
+            self._index(payment)
+        logger.info(f"Loaded {len(self._payments)} payments")
+
+    def _index(self, payment):
+        self._payments[payment['id']] = payment
+        self._by_buyer.setdefault(payment['user_id'], {})[payment['id']] = payment
+        if payment.get('slide_id'):
+            self._by_slide.setdefault(payment['slide_id'], {})[payment['id']] = payment
+
+    def __len__(self):
+        return len(self._payments)
+
+    def all(self):
+        return list(self._payments.values())
+
+    def get(self, payment_id):
+        return self._payments.get(payment_id)
+
+    def by_buyer(self, user_id):
+        return list(self._by_buyer.get(user_id, {}).values())
+
+    def by_slide(self, slide_id):
+        return list(self._by_slide.get(slide_id, {}).values())
+
+    def resolve(self, token):
+        """Find a payment from callback data.
+
+        Old admin messages carry the buyer's user id instead of a payment id;
+        those still resolve as long as the buyer has exactly one pending payment.
+        """
+        payment = self._payments.get(token)
+        if payment is not None or not token.isdigit():
+            return payment
+        pending = [p for p in self.by_buyer(int(token)) if p['status'] == PENDING]
+        return pending[0] if len(pending) == 1 else None
+
+    def claim(self, payment_id):
+        """Mark a pending payment as being approved; False if it is not pending.
+
+        Synchronous, so two clicks on the same approve button cannot both
+        pass. Finish with set_status() or give the payment back with unclaim().
+        """
+        payment = self._payments.get(payment_id)
+        if payment is None or payment['status'] != PENDING:
+            return False
+        payment['status'] = APPROVING
+        return True
+
+    def unclaim(self, payment_id):
+        payment = self._payments.get(payment_id)
+        if payment is not None and payment['status'] == APPROVING:
+            payment['status'] = PENDING
+
+    async def create(self, payment):
+        payment['id'] = uuid4().hex
+        payment['status'] = PENDING
+        payment['created_at'] = time.time()
+        self._index(payment)
+        await self.writer.submit(self.storage.put_payment, payment)
+        return payment
+
+    async def set_status(self, payment_id, status, **fields):
+        payment = self._payments.get(payment_id)
+        if payment is None:
+            return None
+        payment['status'] = status
+        payment[f"{status}_at"] = time.time()
+        payment.update(fields)
+        await self.writer.submit(self.storage.put_payment, payment)
+        return payment
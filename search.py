@@ -0,0 +1,664 @@
+import os
+import re
+import bisect
+import heapq
+import logging
+from datetime import datetime
+from collections import Counter, OrderedDict
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"\w+")
+
+# str.lower() "I" hərfini "i", "İ" hərfini isə "i̇" (nöqtəli i + birləşən işarə) edir;
+# Azərbaycan əlifbasında bunlar "ı" və "i"-dir
+_TURKIC_CASE = str.maketrans({'I': 'ı', 'İ': 'i'})
+
+# İstifadəçilər tez-tez xüsusi hərfləri latın qarşılıqları ilə yazırlar
+_AZ_FOLD = str.maketrans({
+    'ə': 'e', 'ı': 'i', 'ş': 's', 'ç': 'c', 'ğ': 'g', 'ö': 'o', 'ü': 'u',
+})
+
+
+def fold(text):
+    """Lowercase with Turkic I/İ rules and fold Azerbaijani letters to ASCII."""
+    return (text or '').translate(_TURKIC_CASE).lower().translate(_AZ_FOLD)
+
+
+def normalize(text):
+    return fold(text).strip()
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(normalize(text))
+
+
+# Bütün sətirlərdən böyük simvol; bisect ilə prefiks aralığının sonunu tapmaq üçün
+_MAX_CHAR = chr(0x10FFFF)
+
+
+def trigrams(token):
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """Trigram index over a vocabulary of tokens for typo-tolerant lookups.
+
+    Indexing distinct tokens rather than whole names keeps the posting lists
+    short: a catalog of 50k slides has only a few thousand distinct words.
+    """
+
+    def __init__(self, threshold=0.35):
+        self.threshold = threshold
+        self._postings = {}
+        self._sizes = {}
+
+    def __len__(self):
+        return len(self._sizes)
+
+    def add(self, token):
+        grams = trigrams(token)
+        self._sizes[token] = len(grams)
+        for gram in grams:
+            self._postings.setdefault(gram, set()).add(token)
+
+    def discard(self, token):
+        if self._sizes.pop(token, None) is None:
+            return
+        for gram in trigrams(token):
+            postings = self._postings[gram]
+            postings.discard(token)
+            if not postings:
+                del self._postings[gram]
+
+    def similar(self, token, threshold=None):
+        """Return {indexed token: Jaccard similarity} for tokens above the threshold."""
+        threshold = self.threshold if threshold is None else threshold
+        grams = trigrams(token)
+        counts = Counter()
+        for gram in grams:
+            postings = self._postings.get(gram)
+            if postings:
+                counts.update(postings)
+
+        result = {}
+        for candidate, shared in counts.items():
+            similarity = shared / (len(grams) + self._sizes[candidate] - shared)
+            if similarity >= threshold:
+                result[candidate] = similarity
+        return result
+
+
+class NameIndex:
+    """Token/prefix inverted index over slide names.
+
+    Each query token matches every indexed token it is a prefix of; the
+    candidate set is the intersection of those posting lists, ranked by how
+    well the name matches. When that finds nothing, query tokens are also
+    expanded to similar vocabulary tokens through a trigram index, so
+    misspellings like "riyaziyat" still find "Riyaziyyat". Registered as a
+    catalog listener so it is kept up to date on every add, edit and delete.
+    """
+
+    # Bundan qısa sözlər üçün qeyri-dəqiq axtarış çox səs-küy verir
+    MIN_FUZZY_LENGTH = 3
+    # Bundan kiçik qruplar birbaşa sıralanır
+    SMALL_GROUP = 256
+
+    def __init__(self):
+        self._postings = {}
+        self._tokens = []
+        self._doc_tokens = {}
+        # id -> (uzunluq, normallaşdırılmış ad, id): bərabər xallı nəticələrin sırası
+        self._sort_keys = {}
+        # Hər söz üçün həmin açarların sıralanmış siyahısı: səhifəni bütün qrupu sıralamadan tapmaq üçün
+        self._ranked = {}
+        # (normallaşdırılmış ad, id), tam və prefiks üst-üstə düşmələri üçün
+        self._sorted_names = []
+        # Eyni sırada yalnız id-lər: aralıqdan çoxluq qurmaq üçün
+        self._sorted_ids = []
+        self.trigrams = TrigramIndex()
+
+    def __len__(self):
+        return len(self._doc_tokens)
+
+    def add(self, slide):
+        slide_id = slide['id']
+        if slide_id in self._doc_tokens:
+            self.discard(slide_id)
+        tokens = set(tokenize(slide.get('name', '')))
+        self._doc_tokens[slide_id] = tokens
+        name = normalize(slide.get('name', ''))
+        key = self._sort_keys[slide_id] = (len(name), name, slide_id)
+        position = bisect.bisect_left(self._sorted_names, (name, slide_id))
+        self._sorted_names.insert(position, (name, slide_id))
+        self._sorted_ids.insert(position, slide_id)
+        for token in tokens:
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = set()
+                bisect.insort(self._tokens, token)
+                self._ranked[token] = []
+                self.trigrams.add(token)
+            postings.add(slide_id)
+            bisect.insort(self._ranked[token], key)
+
+    def discard(self, slide_id):
+        tokens = self._doc_tokens.pop(slide_id, None)
+        if tokens is None:
+            return
+        key = self._sort_keys.pop(slide_id)
+        name = key[1]
+        position = bisect.bisect_left(self._sorted_names, (name, slide_id))
+        del self._sorted_names[position]
+        del self._sorted_ids[position]
+        for token in tokens:
+            postings = self._postings[token]
+            postings.discard(slide_id)
+            ranked = self._ranked[token]
+            del ranked[bisect.bisect_left(ranked, key)]
+            if not postings:
+                del self._postings[token]
+                del self._ranked[token]
+                del self._tokens[bisect.bisect_left(self._tokens, token)]
+                self.trigrams.discard(token)
+
+    def prefix_tokens(self, prefix):
+        start = bisect.bisect_left(self._tokens, prefix)
+        end = start
+        while end < len(self._tokens) and self._tokens[end].startswith(prefix):
+            end += 1
+        return self._tokens[start:end]
+
+    def _expand(self, query_token, fuzzy):
+        """Map a query token to {vocabulary token: match weight}."""
+        weights = {token: 1.0 for token in self.prefix_tokens(query_token)}
+        if query_token in self._postings:
+            weights[query_token] = 2.0
+        if fuzzy and len(query_token) >= self.MIN_FUZZY_LENGTH:
+            for token, similarity in self.trigrams.similar(query_token).items():
+                weights.setdefault(token, similarity)
+        return weights
+
+    def _groups(self, expansions):
+        """Group slides matching every expansion by score: ({score: ids}, tokens of the narrowest expansion).
+
+        Scores are built with set operations: a slide gets, per query token,
+        the highest weight among the vocabulary tokens it contains.
+        """
+        tiers = sorted(
+            ((self._tiers(weights), weights) for weights in expansions),
+            key=lambda item: sum(len(ids) for _, ids in item[0])
+        )
+        # Ən dar söz namizədləri qruplara bölür, qalanları onları süzür və xal əlavə edir
+        groups = {}
+        seen = set()
+        for weight, ids in tiers[0][0]:
+            part = ids - seen if seen else ids
+            if part:
+                groups[weight] = part
+                seen |= part
+        for other, _ in tiers[1:]:
+            groups = self._regroup(groups, other, keep_rest=False)
+            if not groups:
+                break
+        return groups, tiers[0][1]
+
+    def search(self, query, fuzzy=True, limit=None):
+        """Return slide ids matching every token of `query`, best match first.
+
+        With `limit`, only the best `limit` ids are ranked and returned.
+        """
+        query_tokens = list(dict.fromkeys(tokenize(query)))
+        if not query_tokens:
+            return []
+
+        expansions = [self._expand(t, fuzzy=False) for t in query_tokens]
+        groups, narrowest = self._groups(expansions) if all(expansions) else ({}, None)
+        if not groups and fuzzy:
+            expansions = [self._expand(t, fuzzy=True) for t in query_tokens]
+            if not all(expansions):
+                return []
+            groups, narrowest = self._groups(expansions)
+        if not groups:
+            return []
+        groups = self._regroup(groups, self._phrase_tiers(normalize(query)))
+
+        results = []
+        for value in sorted(groups, reverse=True):
+            ids = groups[value]
+            if limit is not None and len(results) + len(ids) >= limit:
+                results.extend(self._first_ranked(ids, limit - len(results), narrowest))
+                break
+            results.extend(sorted(ids, key=self._sort_keys.__getitem__))
+        return results
+
+    def _first_ranked(self, ids, count, tokens):
+        """The `count` best-ranked of `ids`, which all appear under one of `tokens`, in order."""
+        if len(ids) <= self.SMALL_GROUP:
+            return heapq.nsmallest(count, ids, key=self._sort_keys.__getitem__)
+        # Böyük qrupda sözlərin sıralanmış siyahılarını birləşdirib ilk uyğunları götürmək daha ucuzdur
+        found = []
+        last = None
+        for key in heapq.merge(*(self._ranked[t] for t in tokens)):
+            # Bir neçə uyğun sözü olan ad birləşmədə ardıcıl təkrarlanır
+            if key != last and key[2] in ids:
+                found.append(key[2])
+                if len(found) == count:
+                    break
+            last = key
+        return found
+
+    def _tiers(self, weights):
+        """[(weight, ids)] for one query token, highest weight first.
+
+        A single-token tier is the posting set itself; callers never mutate tiers or groups.
+        """
+        by_weight = {}
+        for token, weight in weights.items():
+            by_weight.setdefault(weight, []).append(self._postings[token])
+        return [
+            (weight, postings[0] if len(postings) == 1 else set().union(*postings))
+            for weight, postings in sorted(by_weight.items(), reverse=True)
+        ]
+
+    def _phrase_tiers(self, phrase):
+        # Ad sorğunun özüdürsə +10, onunla başlayırsa +3; hər iki aralıq bisect ilə tapılır
+        names = self._sorted_names
+        start = bisect.bisect_left(names, (phrase,))
+        exact_end = bisect.bisect_left(names, (phrase, _MAX_CHAR), start)
+        end = bisect.bisect_left(names, (phrase + _MAX_CHAR,), exact_end)
+        exact = set(self._sorted_ids[start:exact_end])
+        prefix = set(self._sorted_ids[exact_end:end])
+        return [(10.0, exact), (3.0, prefix)]
+
+    @staticmethod
+    def _regroup(groups, tiers, keep_rest=True):
+        """Add each tier's weight to the members of every group, once per id (highest tier wins).
+
+        Members in no tier keep their score, or are dropped if not `keep_rest`.
+        """
+        regrouped = {}
+        for value, ids in groups.items():
+            for weight, tier in tiers:
+                hit = ids & tier
+                if hit:
+                    ids = ids - hit
+                    key = value + weight
+                    if key in regrouped:
+                        regrouped[key] = regrouped[key] | hit
+                    else:
+                        regrouped[key] = hit
+                if not ids:
+                    break
+            if ids and keep_rest:
+                if value in regrouped:
+                    regrouped[value] = regrouped[value] | ids
+                else:
+                    regrouped[value] = ids
+        return regrouped
+
+
+# Qiymət aralıqlarının yuxarı sərhədləri (AZN); sonuncu aralıq açıqdır
+PRICE_BUCKETS = (5, 10, 20)
+
+
+def price_bucket(price):
+    try:
+        price = float(price)
+    except (TypeError, ValueError):
+        return None
+    for i, limit in enumerate(PRICE_BUCKETS):
+        if price <= limit:
+            return i
+    return len(PRICE_BUCKETS)
+
+
+def file_kind(slide):
+    # file_type sahəsi köhnə qeydlərdə MIME, yenilərində uzantıdır; fayl adı etibarlıdır
+    extension = slide.get('file_extension') or os.path.splitext(slide.get('file', ''))[1]
+    return extension.lower().lstrip('.') or None
+
+
+class FacetIndex:
+    """Posting sets per facet value for category, language, file type and price bucket.
+
+    Combined filters are answered by intersecting the selected postings,
+    smallest first, and facet counts by intersecting each value's postings
+    with the result of the other filters. Registered as a catalog listener.
+    """
+
+    FACETS = {
+        'category': lambda slide: normalize(slide.get('category')) or None,
+        'language': lambda slide: normalize(slide.get('language')) or None,
+        'file_type': file_kind,
+        'price': lambda slide: price_bucket(slide.get('price')),
+    }
+
+    def __init__(self):
+        self._postings = {facet: {} for facet in self.FACETS}
+        self._values = {}
+
+    def __len__(self):
+        return len(self._values)
+
+    @staticmethod
+    def key(facet, value):
+        """Normalize a user-facing value the same way slides are indexed."""
+        if facet in ('category', 'language'):
+            return normalize(value)
+        return value
+
+    def add(self, slide):
+        slide_id = slide['id']
+        if slide_id in self._values:
+            self.discard(slide_id)
+        values = {facet: extract(slide) for facet, extract in self.FACETS.items()}
+        self._values[slide_id] = values
+        for facet, value in values.items():
+            if value is not None:
+                self._postings[facet].setdefault(value, set()).add(slide_id)
+
+    def discard(self, slide_id):
+        values = self._values.pop(slide_id, None)
+        if values is None:
+            return
+        for facet, value in values.items():
+            postings = self._postings[facet].get(value)
+            if postings is None:
+                continue
+            postings.discard(slide_id)
+            if not postings:
+                del self._postings[facet][value]
+
+    def ids(self, facet, value):
+        return self._postings[facet].get(self.key(facet, value), set())
+
+    def filter(self, **selected):
+        """Slide ids matching every selected facet value; None means "any"."""
+        postings = [self.ids(facet, value) for facet, value in selected.items() if value is not None]
+        if not postings:
+            return set(self._values)
+        postings.sort(key=len)
+        result = set(postings[0])
+        for ids in postings[1:]:
+            result &= ids
+            if not result:
+                break
+        return result
+
+    def counts(self, facet, **selected):
+        """{value: result count} for `facet`, given the other selected filters."""
+        others = {f: v for f, v in selected.items() if f != facet and v is not None}
+        base = self.filter(**others) if others else None
+        return {
+            value: len(ids) if base is None else len(ids & base)
+            for value, ids in self._postings[facet].items()
+        }
+
+
+class ResultCache:
+    """LRU cache of search results stamped with the catalog version.
+
+    An entry computed for an older catalog version is treated as a miss and
+    recomputed, so results are never served across an add, edit or delete.
+    """
+
+    def __init__(self, capacity=256):
+        self.capacity = capacity
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_or_compute(self, key, version, compute):
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == version:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        result = tuple(compute())
+        self._entries[key] = (version, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+        return result
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+def _timestamp(slide):
+    try:
+        return datetime.fromisoformat(slide['timestamp']).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return 0.0
+
+
+def _price(slide):
+    try:
+        return float(slide.get('price', 0))
+    except (TypeError, ValueError):
+        return float('inf')
+
+
+class SortedViews:
+    """Catalog orderings kept sorted incrementally with bisect.
+
+    Each view is a sorted list of (key, slide_id) pairs; add/discard insert
+    and remove single entries, so the first K slides of a view are a slice
+    rather than a sort of the whole catalog. Registered as a catalog
+    listener, which covers new approvals and sales counter updates.
+    """
+
+    VIEWS = {
+        'popular': lambda slide: (-slide.get('sales', 0), normalize(slide.get('name'))),
+        'newest': lambda slide: (-_timestamp(slide), normalize(slide.get('name'))),
+        'cheapest': lambda slide: (_price(slide), normalize(slide.get('name'))),
+    }
+
+    def __init__(self):
+        self._views = {view: [] for view in self.VIEWS}
+        self._keys = {}
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, slide):
+        slide_id = slide['id']
+        if slide_id in self._keys:
+            self.discard(slide_id)
+        keys = {view: (key(slide), slide_id) for view, key in self.VIEWS.items()}
+        self._keys[slide_id] = keys
+        for view, entry in keys.items():
+            bisect.insort(self._views[view], entry)
+
+    def discard(self, slide_id):
+        keys = self._keys.pop(slide_id, None)
+        if keys is None:
+            return
+        for view, entry in keys.items():
+            entries = self._views[view]
+            del entries[bisect.bisect_left(entries, entry)]
+
+    def top(self, view, k, offset=0):
+        return [slide_id for _, slide_id in self._views[view][offset:offset + k]]
+
+    def order(self, view, slide_ids):
+        """Return `slide_ids` in the order of `view`."""
+        slide_ids = [i for i in slide_ids if i in self._keys]
+        # Böyük nəticə dəstləri üçün hazır sıralanmış siyahını süzmək daha ucuzdur
+        if len(slide_ids) * 8 > len(self._keys):
+            wanted = set(slide_ids)
+            return [slide_id for _, slide_id in self._views[view] if slide_id in wanted]
+        return sorted(slide_ids, key=lambda i: self._keys[i][view])
+
+
+class ContentIndex:
+    """Inverted index over the text extracted from slide files.
+
+    Postings map a token to {slide_id: occurrences}; a query matches slides
+    containing every query token (or a word starting with it) and ranks them
+    by total occurrences. Only each slide's token set is kept, for discard();
+    snippet() works on text the caller reads back from the extraction cache.
+    """
+
+    SNIPPET_RADIUS = 60
+
+    def __init__(self):
+        self._postings = {}
+        self._tokens = {}
+        self._sorted_tokens = None
+        self.version = 0
+
+    def __len__(self):
+        return len(self._tokens)
+
+    def add(self, slide_id, counts):
+        """Index a slide from {token: occurrences}; see extract.extract_tokens()."""
+        self.discard(slide_id)
+        self._tokens[slide_id] = tuple(counts)
+        for token, count in counts.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+                self._sorted_tokens = None
+            postings[slide_id] = count
+        self.version += 1
+
+    def discard(self, slide_id):
+        tokens = self._tokens.pop(slide_id, None)
+        if tokens is None:
+            return
+        for token in tokens:
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            postings.pop(slide_id, None)
+            if not postings:
+                del self._postings[token]
+                self._sorted_tokens = None
+        self.version += 1
+
+    def _prefix_tokens(self, prefix):
+        # Lüğət yalnız dəyişəndən sonra ilk sorğuda yenidən sıralanır
+        if self._sorted_tokens is None:
+            self._sorted_tokens = sorted(self._postings)
+        tokens = self._sorted_tokens
+        start = bisect.bisect_left(tokens, prefix)
+        end = start
+        while end < len(tokens) and tokens[end].startswith(prefix):
+            end += 1
+        return tokens[start:end]
+
+    def search(self, query):
+        query_tokens = list(dict.fromkeys(tokenize(query)))
+        if not query_tokens:
+            return []
+
+        scores = None
+        for query_token in query_tokens:
+            matches = Counter()
+            for token in self._prefix_tokens(query_token):
+                matches.update(self._postings[token])
+            if scores is None:
+                scores = matches
+            else:
+                scores = Counter({i: scores[i] + n for i, n in matches.items() if i in scores})
+            if not scores:
+                return []
+        return [slide_id for slide_id, _ in sorted(scores.items(), key=lambda item: (-item[1], item[0]))]
+
+    def snippet(self, text, query):
+        """Text around the first match of `query` in `text` with the match marked as (start, end)."""
+        if not text:
+            return None
+        folded = fold(text)
+        # fold() simvol sayını dəyişərsə mövqelər uyğun gəlməz
+        source = text if len(folded) == len(text) else folded
+        for token in tokenize(query):
+            match = re.search(r"\b" + re.escape(token), folded)
+            if match:
+                break
+        else:
+            return None
+
+        start = max(0, match.start() - self.SNIPPET_RADIUS)
+        end = min(len(source), match.end() + self.SNIPPET_RADIUS)
+        fragment = source[start:end].replace("\n", " ")
+        prefix = "…" if start > 0 else ""
+        suffix = "…" if end < len(source) else ""
+        return (prefix + fragment + suffix, match.start() - start + len(prefix),
+                match.end() - start + len(prefix))
+
+
+class Suggester:
+    """Sorted-array prefix index over normalized slide names and categories.
+
+    Each distinct phrase is stored once with the number of slides using it,
+    so 100k slides cost one sorted list of strings plus a small dict entry
+    per phrase. Registered as a catalog listener.
+    """
+
+    # Qısa prefikslər üçün baxılan ən çox ifadə sayı
+    SCAN_LIMIT = 500
+
+    def __init__(self):
+        self._keys = []
+        self._entries = {}
+        self._by_slide = {}
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, slide):
+        slide_id = slide['id']
+        if slide_id in self._by_slide:
+            self.discard(slide_id)
+        phrases = []
+        for kind in ('name', 'category'):
+            text = (slide.get(kind) or '').strip()
+            key = normalize(text)
+            if not key or key in phrases:
+                continue
+            entry = self._entries.get(key)
+            if entry is None:
+                self._entries[key] = [1, kind, text]
+                bisect.insort(self._keys, key)
+            else:
+                entry[0] += 1
+            phrases.append(key)
+        self._by_slide[slide_id] = phrases
+
+    def discard(self, slide_id):
+        for key in self._by_slide.pop(slide_id, ()):
+            entry = self._entries[key]
+            entry[0] -= 1
+            if not entry[0]:
+                del self._entries[key]
+                del self._keys[bisect.bisect_left(self._keys, key)]
+
+    def suggest(self, query, limit=5, min_length=2):
+        """Return up to `limit` (kind, text) pairs completing `query`.
+
+        If nothing starts with the whole query, the query is shortened one
+        character at a time, so a typo near the end still gets suggestions.
+        """
+        key = normalize(query)
+        while len(key) >= min_length:
+            start = bisect.bisect_left(self._keys, key)
+            end = bisect.bisect_left(self._keys, key + "\uffff", start)
+            if end > start:
+                candidates = self._keys[start:min(end, start + self.SCAN_LIMIT)]
+                best = heapq.nsmallest(
+                    limit, candidates, key=lambda k: (-self._entries[k][0], len(k), k)
+                )
+                return [(self._entries[k][1], self._entries[k][2]) for k in best]
+            key = key[:-1]
+        return []
@@ -0,0 +1,559 @@
+import os
+import sys
+import json
+import asyncio
+import sqlite3
+import logging
+from uuid import uuid4
+
+logger = logging.getLogger(__name__)
+
+
+def _read_json_list(path):
+    if os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except json.JSONDecodeError:
+            logger.error(f"Error decoding {path}. Creating empty database.")
+    return []
+
+
+def _write_text_atomic(path, text):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _write_json_list(path, items):
+    _write_text_atomic(path, json.dumps(items, indent=2, ensure_ascii=False))
+
+
+class JSONStorage:
+    """Flat-file storage: db.json, payments.json and pending_uploads.json.
+
+    Slide mutations are appended as small delta records to a JSONL journal
+    next to db.json, so their cost does not grow with the catalog. On load
+    the journal is replayed on top of the db.json snapshot, and compaction
+    periodically folds it back into a fresh snapshot. Payments and pending
+    uploads are read once and rewritten in full when they change.
+
+    Mutations only update memory and stage the write; take_pending() and
+    commit() turn everything staged so far into one durable write.
+    """
+
+    def __init__(self, db_file, payments_file, pending_file):
+        self.db_file = db_file
+        self.payments_file = payments_file
+        self.pending_file = pending_file
+        self.journal_file = f"{os.path.splitext(db_file)[0]}.journal.jsonl"
+        self.old_journal_file = f"{os.path.splitext(db_file)[0]}.journal.old.jsonl"
+        self.journal_entries = 0
+        self._journal_lines = []
+        self._dirty = set()
+        self._slides = None
+        self._payments = None
+        self._pending = None
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    # -- Slides --
+    def load_slides(self):
+        self._slides = {}
+        for slide in _read_json_list(self.db_file):
+            # Köhnə qeydlərdə id olmaya bilər
+            slide.setdefault('id', str(uuid4()))
+            self._slides[slide['id']] = slide
+
+        # Yarımçıq qalmış sıxlaşdırmanın jurnalı da daxil olmaqla dəyişiklikləri tətbiq et
+        self.journal_entries = 0
+        for path in (self.old_journal_file, self.journal_file):
+            self.journal_entries += self._replay(path)
+        if self.journal_entries:
+            logger.info(f"Replayed {self.journal_entries} journal entries on top of {self.db_file}")
+        return list(self._slides.values())
+
+    def _replay(self, path):
+        """Apply the entries of a journal file; returns how many were applied.
+
+        A crash in the middle of an append leaves a partial last line. It is
+        cut off here, before anything else is appended, so the next entry
+        starts on a line of its own instead of being glued onto it.
+        """
+        if not os.path.exists(path):
+            return 0
+        applied = 0
+        offset = 0
+        torn = None
+        with open(path, 'rb') as f:
+            for line_no, line in enumerate(f, start=1):
+                if not line.endswith(b"\n"):
+                    torn = (line_no, offset)
+                    break
+                offset += len(line)
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    # Ortadakı korlanmış sətir: sonrakı qeydlər itməsin deyə yalnız o keçilir
+                    logger.error(f"Skipping corrupt journal entry at {path}:{line_no}")
+                    continue
+                self._apply(entry)
+                applied += 1
+        if torn is not None:
+            line_no, offset = torn
+            logger.warning(f"Truncating partial journal entry at {path}:{line_no}")
+            with open(path, 'r+b') as f:
+                f.truncate(offset)
+                f.flush()
+                os.fsync(f.fileno())
+        return applied
+
+    def _apply(self, entry):
+        op = entry['op']
+        if op == 'put':
+            self._slides[entry['slide']['id']] = entry['slide']
+        elif op == 'set':
+            slide = self._slides.get(entry['id'])
+            if slide is not None:
+                slide.update(entry['fields'])
+        elif op == 'del':
+            self._slides.pop(entry['id'], None)
+
+    def _append(self, entry):
+        # Sətir dərhal seriyalaşdırılır ki, sonrakı dəyişikliklər onu korlamasın
+        self._journal_lines.append(json.dumps(entry, ensure_ascii=False) + "\n")
+        self.journal_entries += 1
+
+    def put_slide(self, slide):
+        if self._slides is None:
+            self.load_slides()
+        self._slides[slide['id']] = slide
+        self._append({'op': 'put', 'slide': slide})
+
+    def update_slide(self, slide, fields):
+        if self._slides is None:
+            self.load_slides()
+        self._slides[slide['id']] = slide
+        self._append({'op': 'set', 'id': slide['id'], 'fields': fields})
+
+    def delete_slide(self, slide_id):
+        if self._slides is None:
+            self.load_slides()
+        if self._slides.pop(slide_id, None) is not None:
+            self._append({'op': 'del', 'id': slide_id})
+
+    def prepare_compaction(self):
+        """Rotate the journal and snapshot the slides.
+
+        Must not run concurrently with commit(). Returns the copied slide
+        list for write_compaction(), or None when the journal is empty.
+        Replaying the rotated journal on top of either the old or the new
+        snapshot yields the same state, so a crash at any point of the
+        compaction is safe.
+        """
+        if not self.journal_entries or self._slides is None:
+            return None
+
+        if os.path.exists(self.old_journal_file):
+            # Əvvəlki sıxlaşdırma başa çatmayıb, jurnalları birləşdir
+            if os.path.exists(self.journal_file):
+                with open(self.journal_file, 'r', encoding='utf-8') as src, \
+                        open(self.old_journal_file, 'a', encoding='utf-8') as dst:
+                    dst.write(src.read())
+                os.remove(self.journal_file)
+        elif os.path.exists(self.journal_file):
+            os.replace(self.journal_file, self.old_journal_file)
+
+        self.journal_entries = len(self._journal_lines)
+        return [dict(slide) for slide in self._slides.values()]
+
+    def write_compaction(self, slides):
+        """Write the snapshot and drop the rotated journal; safe to run in a thread."""
+        _write_json_list(self.db_file, slides)
+        if os.path.exists(self.old_journal_file):
+            os.remove(self.old_journal_file)
+        logger.info(f"Compacted slide journal into {self.db_file} ({len(slides)} slides)")
+
+    # -- Payments --
+    def load_payments(self):
+        if self._payments is None:
+            self._payments = {}
+            for payment in _read_json_list(self.payments_file):
+                # Köhnə qeydlərdə id və status yoxdur, onlar hələ təsdiq gözləyir
+                payment.setdefault('id', uuid4().hex)
+                payment.setdefault('status', 'pending')
+                self._payments[payment['id']] = payment
+        return list(self._payments.values())
+
+    def put_payment(self, payment):
+        self.load_payments()
+        self._payments[payment['id']] = payment
+        self._dirty.add('payments')
+
+    # -- Pending uploads --
+    def load_pending_uploads(self):
+        if self._pending is None:
+            self._pending = {(u['user_id'], u['slide_id']): u for u in _read_json_list(self.pending_file)}
+        return list(self._pending.values())
+
+    def put_pending_upload(self, upload):
+        self.load_pending_uploads()
+        self._pending[(upload['user_id'], upload['slide_id'])] = upload
+        self._dirty.add('pending')
+
+    def delete_pending_upload(self, user_id, slide_id):
+        self.load_pending_uploads()
+        if self._pending.pop((user_id, slide_id), None) is not None:
+            self._dirty.add('pending')
+
+    # -- Group commit --
+    def take_pending(self):
+        """Serialize everything staged so far; runs on the event loop."""
+        if not self._journal_lines and not self._dirty:
+            return None
+        files = {}
+        if 'payments' in self._dirty:
+            files[self.payments_file] = json.dumps(list(self._payments.values()), indent=2, ensure_ascii=False)
+        if 'pending' in self._dirty:
+            files[self.pending_file] = json.dumps(list(self._pending.values()), indent=2, ensure_ascii=False)
+        job = (self._journal_lines, files)
+        self._journal_lines = []
+        self._dirty = set()
+        return job
+
+    def commit(self, job):
+        """Write a take_pending() job to disk; safe to run in a thread."""
+        journal_lines, files = job
+        if journal_lines:
+            with open(self.journal_file, 'a', encoding='utf-8') as f:
+                f.write(''.join(journal_lines))
+                f.flush()
+                os.fsync(f.fileno())
+        for path, text in files.items():
+            _write_text_atomic(path, text)
+
+    def flush(self):
+        job = self.take_pending()
+        if job is not None:
+            self.commit(job)
+
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS slides (
+    id TEXT PRIMARY KEY,
+    owner INTEGER,
+    category TEXT,
+    language TEXT,
+    file TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_slides_owner ON slides(owner);
+CREATE INDEX IF NOT EXISTS idx_slides_category ON slides(category);
+CREATE INDEX IF NOT EXISTS idx_slides_language ON slides(language);
+
+CREATE TABLE IF NOT EXISTS payments (
+    id TEXT PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    slide_id TEXT,
+    status TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_payments_user ON payments(user_id);
+CREATE INDEX IF NOT EXISTS idx_payments_slide ON payments(slide_id);
+CREATE INDEX IF NOT EXISTS idx_payments_status ON payments(status);
+
+CREATE TABLE IF NOT EXISTS pending_uploads (
+    user_id INTEGER NOT NULL,
+    slide_id TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (user_id, slide_id)
+);
+"""
+
+
+class SQLiteStorage:
+    """SQLite storage with one row per record.
+
+    Indexed columns are duplicated out of the JSON record so lookups and
+    single-record writes stay O(1) statements regardless of table size.
+    Mutations are staged as statements and committed in one transaction
+    on a dedicated write connection; reads use their own connection.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = None
+        self._write_conn = None
+        self._statements = []
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # WAL rejimində NORMAL son tranzaksiyaları elektrik kəsilməsində itirə bilər;
+        # yazıçı çağıranlara yalnız məlumat diskə düşəndən sonra cavab verir
+        conn.execute("PRAGMA synchronous=FULL")
+        return conn
+
+    def open(self):
+        if self.conn is not None:
+            return
+        self.conn = self._connect()
+        self.conn.executescript(SQLITE_SCHEMA)
+        self.conn.commit()
+        self._write_conn = self._connect()
+
+    def close(self):
+        for conn in (self.conn, self._write_conn):
+            if conn is not None:
+                conn.close()
+        self.conn = None
+        self._write_conn = None
+
+    def _dumps(self, record):
+        return json.dumps(record, ensure_ascii=False)
+
+    def _stage(self, sql, params):
+        self._statements.append((sql, params))
+
+    # -- Slides --
+    def load_slides(self):
+        rows = self.conn.execute("SELECT data FROM slides ORDER BY rowid").fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def put_slide(self, slide):
+        self._stage(
+            "INSERT INTO slides (id, owner, category, language, file, data) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET owner=excluded.owner, category=excluded.category, "
+            "language=excluded.language, file=excluded.file, data=excluded.data",
+            (slide['id'], slide.get('owner'), slide.get('category'), slide.get('language'),
+             slide.get('file'), self._dumps(slide))
+        )
+
+    def update_slide(self, slide, fields):
+        self.put_slide(slide)
+
+    def delete_slide(self, slide_id):
+        self._stage("DELETE FROM slides WHERE id = ?", (slide_id,))
+
+    def prepare_compaction(self):
+        return None
+
+    def write_compaction(self, slides):
+        pass
+
+    # -- Payments --
+    def load_payments(self):
+        rows = self.conn.execute("SELECT data FROM payments ORDER BY rowid").fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def put_payment(self, payment):
+        self._stage(
+            "INSERT INTO payments (id, user_id, slide_id, status, data) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET status=excluded.status, data=excluded.data",
+            (payment['id'], payment['user_id'], payment.get('slide_id'), payment['status'],
+             self._dumps(payment))
+        )
+
+    # -- Pending uploads --
+    def load_pending_uploads(self):
+        rows = self.conn.execute("SELECT data FROM pending_uploads ORDER BY rowid").fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def put_pending_upload(self, upload):
+        self._stage(
+            "INSERT OR REPLACE INTO pending_uploads (user_id, slide_id, data) VALUES (?, ?, ?)",
+            (upload['user_id'], upload['slide_id'], self._dumps(upload))
+        )
+
+    def delete_pending_upload(self, user_id, slide_id):
+        self._stage(
+            "DELETE FROM pending_uploads WHERE user_id = ? AND slide_id = ?", (user_id, slide_id)
+        )
+
+    # -- Group commit --
+    def take_pending(self):
+        if not self._statements:
+            return None
+        job = self._statements
+        self._statements = []
+        return job
+
+    def commit(self, job):
+        with self._write_conn:
+            for sql, params in job:
+                self._write_conn.execute(sql, params)
+
+    def flush(self):
+        job = self.take_pending()
+        if job is not None:
+            self.commit(job)
+
+
+class PersistenceWriter:
+    """Single asyncio task that owns every write to the storage backend.
+
+    Handlers submit mutations through a queue and await the returned future.
+    Queued mutations are applied in order and committed as one batch in a
+    worker thread; each future resolves once the batch is durable. A
+    mutation reaching an idle writer is committed right away. Only when
+    others are already queued behind it does the writer wait up to
+    `window` seconds to gather more. Mutations submitted while a batch is
+    being committed form the next batch. Compaction is run by the same task
+    between batches.
+    """
+
+    def __init__(self, storage, window=0.02):
+        self.storage = storage
+        self.window = window
+        self.batches = 0
+        self.mutations = 0
+        self._queue = None
+        self._task = None
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+
+    def submit(self, method, *args):
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait(('mutation', method, args, future))
+        return future
+
+    def compact(self):
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait(('compact', None, (), future))
+        return future
+
+    async def _run(self):
+        while True:
+            item = await self._queue.get()
+            if item is None:
+                return
+            # Növbə boşdursa dərhal yaz; yığılma varsa, pəncərə ərzində gələnləri də birləşdir
+            if not self._queue.empty():
+                await asyncio.sleep(self.window)
+            batch = [item]
+            stopping = False
+            while not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._process(batch)
+            if stopping:
+                return
+
+    async def _process(self, batch):
+        waiters = []
+        compactions = []
+        for kind, method, args, future in batch:
+            if kind == 'compact':
+                compactions.append(future)
+                continue
+            try:
+                method(*args)
+                waiters.append(future)
+            except Exception as e:
+                logger.error(f"Error applying {method.__name__}: {e}")
+                future.set_exception(e)
+
+        try:
+            job = self.storage.take_pending()
+            if job is not None:
+                await asyncio.to_thread(self.storage.commit, job)
+        except Exception as e:
+            logger.error(f"Error committing storage batch: {e}")
+            for future in waiters:
+                future.set_exception(e)
+        else:
+            self.batches += 1
+            self.mutations += len(waiters)
+            for future in waiters:
+                future.set_result(None)
+
+        if compactions:
+            try:
+                slides = self.storage.prepare_compaction()
+                if slides is not None:
+                    await asyncio.to_thread(self.storage.write_compaction, slides)
+            except Exception as e:
+                logger.error(f"Error compacting storage: {e}")
+                for future in compactions:
+                    future.set_exception(e)
+            else:
+                for future in compactions:
+                    future.set_result(None)
+
+
+def create_storage(backend, db_file, payments_file, pending_file, sqlite_file):
+    if backend == 'sqlite':
+        return SQLiteStorage(sqlite_file)
+    if backend == 'json':
+        return JSONStorage(db_file, payments_file, pending_file)
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+
+def migrate_json_to_sqlite(source, target):
+    """Import every record from a JSONStorage into an empty SQLiteStorage.
+
+    Everything is written in one transaction, so a failed run leaves the
+    target empty and can simply be repeated. Legacy payments get a fresh
+    random id on every load, so a target with rows in any table is refused
+    rather than merged into.
+    """
+    source.open()
+    target.open()
+
+    for table in ('slides', 'payments', 'pending_uploads'):
+        existing = target.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        if existing:
+            raise RuntimeError(f"{target.path} already contains {existing} {table} rows; refusing to migrate twice")
+
+    slides = source.load_slides()
+    payments = source.load_payments()
+    pending = source.load_pending_uploads()
+
+    for slide in slides:
+        slide.setdefault('sales', 0)
+        target.put_slide(slide)
+    for payment in payments:
+        target.put_payment(payment)
+    for upload in pending:
+        target.put_pending_upload(upload)
+    # Bütün cədvəllər bir tranzaksiyada yazılır
+    target.flush()
+
+    logger.info(f"Migrated {len(slides)} slides, {len(payments)} payments and "
+                f"{len(pending)} pending uploads into {target.path}")
+    return len(slides), len(payments), len(pending)
+
+
+if __name__ == '__main__':
+    # python storage.py migrate  -- JSON fayllarını SQLite bazasına köçür
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+    if sys.argv[1:] != ['migrate']:
+        print("Usage: python storage.py migrate")
+        sys.exit(1)
+
+    from config import DB_FILE, PAYMENTS_FILE, PENDING_UPLOADS_FILE, SQLITE_FILE
+    migrate_json_to_sqlite(
+        JSONStorage(DB_FILE, PAYMENTS_FILE, PENDING_UPLOADS_FILE),
+        SQLiteStorage(SQLITE_FILE)
+    )
@@ -0,0 +1,196 @@
+import os
+import json
+import sqlite3
+
+import pytest
+
+from storage import JSONStorage, SQLiteStorage, _write_json_list, migrate_json_to_sqlite
+
+
+def slide(slide_id, **fields):
+    return {'id': slide_id, 'name': f"Slayd {slide_id}", 'sales': 0, **fields}
+
+
+def open_storage(directory):
+    storage = JSONStorage(str(directory / "db.json"), str(directory / "payments.json"),
+                          str(directory / "pending_uploads.json"))
+    storage.load_slides()
+    return storage
+
+
+def reload(directory):
+    return {s['id']: s for s in open_storage(directory).load_slides()}
+
+
+def interleave(storage):
+    """put/set/del mix; returns the state it should leave behind."""
+    storage.put_slide(slide('a'))
+    storage.put_slide(slide('b'))
+    a = slide('a', sales=1)
+    storage.update_slide(a, {'sales': 1})
+    storage.delete_slide('b')
+    storage.put_slide(slide('c', language='AZ'))
+    a = slide('a', sales=1, name="Yeni ad")
+    storage.update_slide(a, {'name': "Yeni ad"})
+    storage.put_slide(slide('b', category="Tarix"))
+    return {'a': a, 'b': slide('b', category="Tarix"), 'c': slide('c', language='AZ')}
+
+
+def test_interleaved_changes_survive_compaction(tmp_path):
+    storage = open_storage(tmp_path)
+    expected = interleave(storage)
+    storage.flush()
+    assert reload(tmp_path) == expected
+
+    storage.write_compaction(storage.prepare_compaction())
+    assert not os.path.exists(storage.journal_file)
+    assert not os.path.exists(storage.old_journal_file)
+    assert reload(tmp_path) == expected
+
+    # Sıxlaşdırmadan sonrakı dəyişikliklər yeni jurnala yazılır
+    storage.delete_slide('c')
+    storage.update_slide(slide('b', category="Fizika"), {'category': "Fizika"})
+    storage.flush()
+    del expected['c']
+    expected['b'] = slide('b', category="Fizika")
+    assert reload(tmp_path) == expected
+
+
+def test_rotated_journal_replays_over_old_and_new_snapshot(tmp_path):
+    storage = open_storage(tmp_path)
+    storage.put_slide(slide('a'))
+    storage.flush()
+    storage.write_compaction(storage.prepare_compaction())
+
+    expected = interleave(storage)
+    storage.flush()
+    slides = storage.prepare_compaction()
+    assert os.path.exists(storage.old_journal_file)
+
+    # Qəza snapshot yazılmazdan əvvəl: köhnə snapshot + fırladılmış jurnal
+    assert reload(tmp_path) == expected
+
+    # Qəza snapshot yazıldıqdan sonra, jurnal silinməzdən əvvəl
+    _write_json_list(storage.db_file, slides)
+    assert reload(tmp_path) == expected
+
+    storage.write_compaction(slides)
+    assert reload(tmp_path) == expected
+
+
+def test_changes_staged_during_compaction_are_kept(tmp_path):
+    storage = open_storage(tmp_path)
+    expected = interleave(storage)
+    storage.flush()
+
+    storage.put_slide(slide('d'))
+    slides = storage.prepare_compaction()
+    storage.delete_slide('a')
+    storage.write_compaction(slides)
+    storage.flush()
+
+    expected['d'] = slide('d')
+    del expected['a']
+    assert reload(tmp_path) == expected
+
+
+def test_interrupted_compaction_journal_is_merged(tmp_path):
+    storage = open_storage(tmp_path)
+    expected = interleave(storage)
+    storage.flush()
+    storage.prepare_compaction()
+    # Qəza: snapshot heç yazılmadı, köhnə jurnal qaldı
+
+    storage = open_storage(tmp_path)
+    assert storage.journal_entries == 7
+    storage.delete_slide('c')
+    storage.put_slide(slide('e'))
+    storage.flush()
+    del expected['c']
+    expected['e'] = slide('e')
+    assert reload(tmp_path) == expected
+
+    slides = storage.prepare_compaction()
+    assert not os.path.exists(storage.journal_file)
+    with open(storage.old_journal_file, encoding='utf-8') as f:
+        assert len(f.readlines()) == 9
+    assert reload(tmp_path) == expected
+
+    storage.write_compaction(slides)
+    assert not os.path.exists(storage.old_journal_file)
+    assert reload(tmp_path) == expected
+
+
+def test_truncated_last_journal_line_is_cut_off(tmp_path):
+    storage = open_storage(tmp_path)
+    expected = interleave(storage)
+    storage.flush()
+    with open(storage.journal_file, 'a', encoding='utf-8') as f:
+        f.write(json.dumps({'op': 'del', 'id': 'a'})[:-5])
+
+    # Birinci yenidən başlama: yarımçıq sətir kəsilir, yeni yazılar ayrı sətirdən başlayır
+    storage = open_storage(tmp_path)
+    assert storage.journal_entries == 7
+    storage.put_slide(slide('d'))
+    storage.delete_slide('c')
+    storage.flush()
+    expected['d'] = slide('d')
+    del expected['c']
+
+    # İkinci yenidən başlama: birincidən sonrakı yazılar itmir
+    storage = open_storage(tmp_path)
+    assert storage.journal_entries == 9
+    assert reload(tmp_path) == expected
+    storage.update_slide(slide('d', sales=2), {'sales': 2})
+    storage.flush()
+    expected['d'] = slide('d', sales=2)
+    assert reload(tmp_path) == expected
+
+    storage.write_compaction(storage.prepare_compaction())
+    assert reload(tmp_path) == expected
+
+
+def test_corrupt_journal_line_is_skipped(tmp_path):
+    storage = open_storage(tmp_path)
+    expected = interleave(storage)
+    storage.flush()
+    with open(storage.journal_file, 'a', encoding='utf-8') as f:
+        f.write('{"op": "del", "id": \n')
+    storage.put_slide(slide('d'))
+    storage.flush()
+    expected['d'] = slide('d')
+
+    assert reload(tmp_path) == expected
+
+
+def test_migration_refuses_a_non_empty_target(tmp_path):
+    source = open_storage(tmp_path)
+    with open(source.payments_file, 'w', encoding='utf-8') as f:
+        # Köhnə ödənişlərin id-si yoxdur, hər oxunuşda yenisi verilir
+        json.dump([{'user_id': 1, 'slide_id': 'a', 'amount': 5}], f)
+    target = SQLiteStorage(str(tmp_path / "slides.db"))
+    assert migrate_json_to_sqlite(source, target) == (0, 1, 0)
+
+    source = open_storage(tmp_path)
+    with pytest.raises(RuntimeError):
+        migrate_json_to_sqlite(source, target)
+    assert len(target.load_payments()) == 1
+    target.close()
+
+
+def test_failed_migration_leaves_the_target_empty(tmp_path):
+    source = open_storage(tmp_path)
+    interleave(source)
+    source.flush()
+    with open(source.payments_file, 'w', encoding='utf-8') as f:
+        json.dump([{'id': 'p1', 'user_id': None, 'slide_id': 'a', 'amount': 5}], f)
+    target = SQLiteStorage(str(tmp_path / "slides.db"))
+    # user_id olmayan ödəniş slaydlar yazıldıqdan sonra NOT NULL məhdudiyyətini pozur
+    with pytest.raises(sqlite3.IntegrityError):
+        migrate_json_to_sqlite(source, target)
+    target.close()
+
+    target = SQLiteStorage(str(tmp_path / "slides.db"))
+    target.open()
+    assert target.load_slides() == [] and target.load_payments() == []
+    target.close()
@@ -0,0 +1,115 @@
+import os
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Ad: (ən böyük tərəf px, JPEG keyfiyyəti)
+RENDITIONS = {
+    'small': (320, 60),
+    'medium': (800, 70),
+}
+
+
+def file_digest(path):
+    """SHA-256 of a file's content. Blocking; meant to run in a worker thread."""
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+class ThumbnailCache:
+    """Smaller renditions of preview images, generated on demand and kept on disk.
+
+    Files are named <source sha256>_<rendition>.jpg, so a rendition is
+    shared by every record that points at identical content and never
+    goes stale. When the directory grows past `budget` bytes the least
+    recently used renditions are deleted.
+    """
+
+    def __init__(self, directory, image_service, budget):
+        self.directory = directory
+        self.image_service = image_service
+        self.budget = budget
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._files = OrderedDict()
+        self._digests = {}
+        self._pending = {}
+
+    def __len__(self):
+        return len(self._files)
+
+    def load(self):
+        """Index renditions already on disk, oldest use (mtime) first."""
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.is_file() and entry.name.endswith('.jpg'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, entry.name, stat.st_size))
+        self._files = OrderedDict((name, size) for _, name, size in sorted(entries))
+        self.size = sum(self._files.values())
+        logger.info(f"Loaded {len(self._files)} thumbnails ({self.size / (1024 * 1024):.1f} MB)")
+
+    async def _digest(self, source):
+        # Heş faylın mtime və ölçüsü dəyişmədikcə yenidən hesablanmır
+        stat = os.stat(source)
+        cached = self._digests.get(source)
+        if cached and cached[0] == (stat.st_mtime_ns, stat.st_size):
+            return cached[1]
+        digest = await asyncio.to_thread(file_digest, source)
+        self._digests[source] = ((stat.st_mtime_ns, stat.st_size), digest)
+        return digest
+
+    async def get(self, source, rendition):
+        """Path of the `rendition` of `source`, rendering it first if needed."""
+        max_side, quality = RENDITIONS[rendition]
+        name = f"{await self._digest(source)}_{rendition}.jpg"
+        path = os.path.join(self.directory, name)
+
+        if name in self._files and os.path.exists(path):
+            self.hits += 1
+            self._files.move_to_end(name)
+            os.utime(path)
+            return path
+
+        # Eyni rendisiya üçün paralel sorğular bir iş gözləyir
+        task = self._pending.get(name)
+        if task is None:
+            self.misses += 1
+            task = asyncio.ensure_future(self._render(source, path, name, max_side, quality))
+            self._pending[name] = task
+            task.add_done_callback(lambda _: self._pending.pop(name, None))
+        return await asyncio.shield(task)
+
+    async def _render(self, source, path, name, max_side, quality):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            size = await self.image_service.thumbnail(source, tmp_path, max_side, quality)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self.size += size - self._files.pop(name, 0)
+        self._files[name] = size
+        self._evict(keep=name)
+        return path
+
+    def _evict(self, keep):
+        while self.size > self.budget and len(self._files) > 1:
+            name, size = next(iter(self._files.items()))
+            if name == keep:
+                break
+            del self._files[name]
+            self.size -= size
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+            logger.debug(f"Evicted thumbnail {name} ({size} bytes)")
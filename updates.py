@@ -0,0 +1,59 @@
+import asyncio
+import logging
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """Processes updates of different users concurrently, each user's in order.
+
+    By default python-telegram-bot handles one update at a time, so a slow
+    handler (image processing, a file download) delays every other user.
+    concurrent_updates(True) alone would also run two updates of the same
+    user at once, letting a double-tapped button submit an upload twice,
+    and ConversationHandler expects a conversation's updates one by one.
+    Here updates from the same user (or chat, for updates without a user)
+    wait for each other and everything else runs in parallel, up to
+    `max_concurrent_updates`.
+    """
+
+    def __init__(self, max_concurrent_updates):
+        super().__init__(max_concurrent_updates)
+        # Açar: [kilid, bu açar üçün gözləyən və ya işlənən yeniləmə sayı]
+        self._locks = {}
+
+    @staticmethod
+    def _key(update):
+        if not isinstance(update, Update):
+            return None
+        if update.effective_user:
+            return ('user', update.effective_user.id)
+        if update.effective_chat:
+            return ('chat', update.effective_chat.id)
+        return None
+
+    async def do_process_update(self, update, coroutine):
+        key = self._key(update)
+        if key is None:
+            await coroutine
+            return
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                await coroutine
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[key]
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
@@ -0,0 +1,106 @@
+import os
+import time
+import logging
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+def _created_at(upload):
+    # Köhnə qeydlərdə yalnız mesaj tarixi var
+    try:
+        return datetime.fromisoformat(upload['timestamp']).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return time.time()
+
+
+class PendingUploads:
+    """In-memory store of uploads waiting for admin review, keyed by (user_id, slide_id).
+
+    Every entry carries a created_at timestamp so stale ones can be expired
+    by the sweep job. Writes go through the PersistenceWriter.
+    """
+
+    def __init__(self, storage, writer):
+        self.storage = storage
+        self.writer = writer
+        self._uploads = {}
+
+    def load(self):
+        self._uploads = {}
+        for upload in self.storage.load_pending_uploads():
+            upload.setdefault('created_at', _created_at(upload))
+            self._uploads[(upload['user_id'], upload['slide_id'])] = upload
+        logger.info(f"Loaded {len(self._uploads)} pending uploads")
+
+    def __len__(self):
+        return len(self._uploads)
+
+    def all(self):
+        return list(self._uploads.values())
+
+    def get(self, user_id, slide_id):
+        return self._uploads.get((user_id, slide_id))
+
+    async def add(self, upload):
+        upload.setdefault('created_at', time.time())
+        self._uploads[(upload['user_id'], upload['slide_id'])] = upload
+        await self.writer.submit(self.storage.put_pending_upload, upload)
+        return upload
+
+    async def remove(self, user_id, slide_id):
+        upload = self._uploads.pop((user_id, slide_id), None)
+        if upload is not None:
+            await self.writer.submit(self.storage.delete_pending_upload, user_id, slide_id)
+        return upload
+
+    def expired(self, ttl, now=None):
+        cutoff = (now or time.time()) - ttl
+        return [u for u in self._uploads.values() if u['created_at'] < cutoff]
+
+
+def upload_files(record):
+    """All files on disk that belong to a slide or pending upload."""
+    paths = []
+    if record.get('file'):
+        paths.append(record['file'])
+    paths.extend(record.get('images', []))
+    return paths
+
+
+def reclaim_files(paths, directories, referenced, max_age):
+    """Delete `paths` plus every file in `directories` that nothing references
+    and that is older than `max_age` seconds.
+
+    Blocking; meant to run in a worker thread. Returns (files, bytes) reclaimed.
+    """
+    referenced = {os.path.normpath(p) for p in referenced}
+    cutoff = time.time() - max_age
+    candidates = {os.path.normpath(p) for p in paths}
+
+    # Söhbət yarımçıq qaldığı üçün heç bir qeydə düşməmiş fayllar
+    for directory in directories:
+        if not os.path.isdir(directory):
+            continue
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if not entry.is_file():
+                    continue
+                path = os.path.normpath(os.path.join(directory, entry.name))
+                if path not in referenced and entry.stat().st_mtime < cutoff:
+                    candidates.add(path)
+
+    files = 0
+    reclaimed = 0
+    for path in candidates - referenced:
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except FileNotFoundError:
+            continue
+        except OSError as e:
+            logger.error(f"Error deleting {path}: {e}")
+            continue
+        files += 1
+        reclaimed += size
+    return files, reclaimed